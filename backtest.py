@@ -3,16 +3,24 @@ import numpy as np
 import yfinance as yf
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import os
 import streamlit as st
 from data import log_message
+from stock_core import symbols
+from stock_core.data_fetcher import load_ohlcv_range
+from stock_core.result_cache import ResultCache, data_version
+from stock_core.strategies import MACross, cross_signals, single_ticker
 import ssl
 
 # 為了解決SSL證書問題，設置無SSL驗證選項
 ssl._create_default_https_context = ssl._create_unverified_context
 
+@st.cache_data(ttl=3600)
 def get_stock_data(stock_code, start_date, end_date):
     """
-    使用 yfinance 獲取股票歷史數據
+    獲取股票歷史數據：本地 OHLCV 儲存已涵蓋區間時直接讀檔，否則由 yfinance 下載並寫回儲存
     
     參數:
     - stock_code: 股票代碼（如 '2330.TW'）
@@ -20,30 +28,77 @@ def get_stock_data(stock_code, start_date, end_date):
     - end_date: 結束日期
     
     返回:
-    - 股票歷史數據 DataFrame
+    - 股票歷史數據 DataFrame（Open / High / Low / Close / Volume，日期 index 不帶時區）
     """
     try:
-        # 如果沒有添加.TW，自動添加
-        if not stock_code.endswith('.TW') and not stock_code.endswith('.TWO'):
-            # 判斷是上市還是上櫃
-            if len(stock_code) == 4 and stock_code.startswith('6'):
-                stock_code = f"{stock_code}.TWO"  # 上櫃股票
-            else:
-                stock_code = f"{stock_code}.TW"   # 上市股票
-            
+        # 沒有後綴時由本地代碼表判斷上市（.TW）或上櫃（.TWO）
+        stock_code = symbols.resolve(stock_code)
+        
         log_message(f"獲取 {stock_code} 從 {start_date} 到 {end_date} 的股票數據")
-        data = yf.download(stock_code, start=start_date, end=end_date, progress=False)
+        data = load_ohlcv_range(stock_code, start_date, end_date)
         
-        if data.empty:
+        if data is None:
             log_message(f"無法獲取 {stock_code} 的股票數據", level="warning")
             return pd.DataFrame()
             
+        data = data[['Open', 'High', 'Low', 'Close', 'Volume']].tz_localize(None)
         log_message(f"成功獲取 {stock_code} 的股票數據，共 {len(data)} 條記錄")
         return data
     except Exception as e:
         log_message(f"獲取 {stock_code} 股票數據時發生錯誤: {str(e)}", level="error")
         return pd.DataFrame()
 
+PANEL_BATCH_SIZE = 50  # 每次 yf.download 的代碼數
+PANEL_CONCURRENCY = 4  # 每批同時下載的連線數
+
+def _download_batch(tickers, start_date, end_date, concurrency):
+    data = yf.download(tickers, start=start_date, end=end_date, group_by='column',
+                       threads=concurrency, progress=False)
+    if data.empty:
+        return data
+    if not isinstance(data.columns, pd.MultiIndex):  # 舊版 yfinance 單一代碼時為單層欄位
+        data.columns = pd.MultiIndex.from_product([data.columns, tickers])
+    return data
+
+@st.cache_data(ttl=3600)
+def get_stock_panel(stock_codes, start_date, end_date, batch_size=PANEL_BATCH_SIZE,
+                    concurrency=PANEL_CONCURRENCY):
+    """
+    批次下載多檔股票，回傳對齊日期的面板
+    
+    參數:
+    - stock_codes: 股票代碼列表（可不帶後綴，由本地代碼表判斷 .TW / .TWO）
+    - start_date / end_date: 日期區間
+    - batch_size: 每次請求的代碼數
+    - concurrency: 每批同時下載的連線數
+    
+    返回:
+    - 欄位為 (欄位, 代碼) 雙層的 DataFrame，如 panel['Close'] 為 日期 x 代碼 的收盤價；
+      index 為所有代碼日期的聯集，缺資料為 NaN，查無資料的代碼不列入
+    """
+    tickers = list(dict.fromkeys(symbols.resolve_many(list(stock_codes))))
+    frames = []
+    for i in range(0, len(tickers), batch_size):
+        batch = tickers[i:i + batch_size]
+        log_message(f"批次下載 {len(batch)} 檔（{i + 1}-{i + len(batch)}/{len(tickers)}）")
+        try:
+            frames.append(_download_batch(batch, start_date, end_date, concurrency))
+        except Exception as e:
+            log_message(f"批次下載失敗: {str(e)}", level="error")
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame()
+    
+    panel = pd.concat(frames, axis=1).sort_index()
+    panel = panel.loc[:, panel.notna().any()]
+    loaded = set(panel.columns.get_level_values(1))
+    missing = [t for t in tickers if t not in loaded]
+    if missing:
+        log_message(f"無法獲取 {len(missing)} 檔的股票數據: {', '.join(missing[:10])}", level="warning")
+    fields = list(dict.fromkeys(panel.columns.get_level_values(0)))
+    order = [(f, t) for f in fields for t in tickers if (f, t) in panel.columns]
+    return panel[order]
+
 def calculate_ma(data, short_window=5, long_window=20):
     """
     計算移動平均線並添加到數據中
@@ -68,6 +123,83 @@ def calculate_ma(data, short_window=5, long_window=20):
     
     return df
 
+def _values(data, col):
+    """取出單一欄位為 1 維 float 陣列（相容 yfinance 的多層欄位）"""
+    values = np.asarray(data[col], dtype=float)
+    return values.reshape(len(values), -1)[:, 0]
+
+def _ffill_index(mask):
+    """每一列往前最近一個 mask 為 True 的位置（之前都沒有時為 -1）"""
+    idx = np.where(mask, np.arange(len(mask)), -1)
+    return np.maximum.accumulate(idx) if len(idx) else idx
+
+def _positions(signal):
+    """持倉狀態：最後一個非 0 訊號向前填滿，第一列固定為 0"""
+    last = _ffill_index(signal != 0)
+    position = np.where(last >= 0, signal[np.maximum(last, 0)], 0)
+    if len(position):
+        position[0] = 0
+    return position
+
+def _simulate(close, signal, initial_capital):
+    """
+    全倉買進 / 全數賣出的成交模擬
+    只在有訊號的列上推進持倉狀態（次數等於交叉次數，而非 K 棒數）
+    返回 (成交列位置, 方向 1/-1, 股數, 成交後現金, 期末資產)
+    """
+    rows, sides, lots, caps = [], [], [], []
+    capital, shares = initial_capital, 0
+    for i in np.flatnonzero(signal):
+        price = close[i]
+        if signal[i] == 1 and shares == 0:
+            qty = int(capital // price)
+            if qty > 0:
+                shares = qty
+                capital -= shares * price
+                rows.append(i); sides.append(1); lots.append(shares); caps.append(capital)
+        elif signal[i] == -1 and shares > 0:
+            capital += shares * price
+            rows.append(i); sides.append(-1); lots.append(shares); caps.append(capital)
+            shares = 0
+    final_value = capital + shares * close[-1] if shares > 0 else capital
+    return (
+        np.asarray(rows, dtype=np.int64),
+        np.asarray(sides, dtype=np.int64),
+        np.asarray(lots, dtype=np.int64),
+        np.asarray(caps, dtype=float),
+        float(final_value),
+    )
+
+def _equity(close, rows, sides, lots, caps, initial_capital):
+    """每日資產（現金 + 持股市值），由成交紀錄向前填滿得出"""
+    n = len(close)
+    held = np.zeros(n, dtype=np.int64)
+    cash = np.full(n, float(initial_capital))
+    if len(rows):
+        mark = np.zeros(n, dtype=bool)
+        mark[rows] = True
+        last = _ffill_index(mark)
+        event = np.searchsorted(rows, np.maximum(last, 0))
+        filled = last >= 0
+        held[filled] = np.where(sides[event[filled]] == 1, lots[event[filled]], 0)
+        cash[filled] = caps[event[filled]]
+    return cash + held * close
+
+def _win_rate(buy_prices, sell_prices):
+    """買賣依序配對，賣價高於買價的比例（%）"""
+    pairs = min(len(buy_prices), len(sell_prices))
+    if pairs == 0:
+        return 0.0
+    wins = np.count_nonzero(sell_prices[:pairs] > buy_prices[:pairs])
+    return float(wins / pairs * 100)
+
+def _evaluate(close, signal, initial_capital):
+    """單次回測的核心數值：(總報酬 %, 勝率 %, 交易次數)，規則與 backtest_strategy 相同"""
+    rows, sides, _, _, final_value = _simulate(close, signal, initial_capital)
+    prices = close[rows]
+    win_rate = _win_rate(prices[sides == 1], prices[sides == -1]) if len(rows) >= 2 else 0.0
+    return (final_value - initial_capital) / initial_capital * 100, win_rate, len(rows)
+
 def generate_signals(data, short_window=5, long_window=20):
     """
     基於移動平均線交叉生成買賣信號
@@ -95,47 +227,58 @@ def generate_signals(data, short_window=5, long_window=20):
         log_message(f"無法找到移動平均線列: {short_ma_col} 或 {long_ma_col}", level="error")
         return df
     
-    # 初始化所有列
-    df['Signal'] = 0  # 信號列
-    df['Position'] = 0  # 持倉狀態列
+    # 交叉以整列陣列比較判斷，持倉狀態為訊號向前填滿
+    signal = cross_signals(_values(df, short_ma_col), _values(df, long_ma_col))
+    df['Signal'] = signal
+    df['Position'] = _positions(signal)
     
-    # 安全地處理每一行數據
-    signal_values = [0] * len(df)  # 預先創建信號列表，默認為0
-    
-    for i in range(1, len(df)):  # 從第二行開始，因為我們需要比較前一行
-        # 當前和前一個時間點的短期和長期均線
-        curr_short = df[short_ma_col].iloc[i]
-        prev_short = df[short_ma_col].iloc[i-1]
-        curr_long = df[long_ma_col].iloc[i]
-        prev_long = df[long_ma_col].iloc[i-1]
-        
-        # 買入信號: 短期均線從下方穿過長期均線
-        if prev_short <= prev_long and curr_short > curr_long:
-            signal_values[i] = 1
-        
-        # 賣出信號: 短期均線從上方穿過長期均線
-        elif prev_short >= prev_long and curr_short < curr_long:
-            signal_values[i] = -1
+    return df
+
+def run_strategy(data, strategy, initial_capital=100000):
+    """
+    以任意策略回測
     
-    # 一次性賦值信號列
-    df['Signal'] = signal_values
+    參數:
+    - data: OHLCV DataFrame
+    - strategy: stock_core.strategies 的策略，或任何 DataFrame -> 訊號陣列（1/-1/0）的函式
+    - initial_capital: 初始資金金額
     
-    # 根據信號計算持倉狀態
-    position_values = [0] * len(df)  # 預先創建持倉列表，默認為0
-    current_position = 0
+    返回:
+    - 與 backtest_strategy 相同
+    """
+    if not isinstance(data, pd.DataFrame) or data.empty:
+        log_message("回測數據為空或格式錯誤", level="error")
+        return pd.DataFrame(), pd.DataFrame(), {}
     
-    for i in range(1, len(df)):
-        signal = signal_values[i]
-        if signal == 1:  # 買入信號
-            current_position = 1
-        elif signal == -1:  # 賣出信號
-            current_position = -1
-        position_values[i] = current_position
+    data = single_ticker(data)
+    signal = np.asarray(strategy(data), dtype=np.int64)
+    df = pd.DataFrame({'Close': _values(data, 'Close'), 'Signal': signal, 'Position': _positions(signal)},
+                      index=data.index)
+    return backtest_strategy(df, initial_capital)
+
+_result_cache = ResultCache()
+
+def cached_backtest(stock_code, start_date, end_date, strategy=None, initial_capital=100000, key=None):
+    """
+    帶持久快取的回測：相同的代碼、日期區間、策略參數與價格資料直接回傳上次的結果
     
-    # 一次性賦值持倉列
-    df['Position'] = position_values
+    參數:
+    - stock_code / start_date / end_date: 同 get_stock_data
+    - strategy: 同 run_strategy（預設為 5/20 日均線交叉）
+    - initial_capital: 初始資金金額
+    - key: 一般函式策略的識別字串（需能區分參數）；Strategy 以其參數識別，
+      非 Strategy 又未給 key 時不使用快取
     
-    return df
+    返回:
+    - 與 backtest_strategy 相同（回測結果含 Signal 欄）
+    """
+    data = get_stock_data(stock_code, start_date, end_date)
+    if data.empty:
+        return pd.DataFrame(), pd.DataFrame(), {}
+    strategy = strategy or MACross()
+    cache_key = _result_cache.key(stock_code, start_date, end_date, strategy, initial_capital,
+                                  version=data_version(data), name=key)
+    return _result_cache.get_or_compute(cache_key, lambda: run_strategy(data, strategy, initial_capital))
 
 def backtest_strategy(data, initial_capital=100000):
     """
@@ -146,7 +289,7 @@ def backtest_strategy(data, initial_capital=100000):
     - initial_capital: 初始資金金額
     
     返回:
-    - 回測結果 DataFrame
+    - 回測結果 DataFrame（含每日資產 Equity）
     - 交易記錄 DataFrame
     - 統計數據 Dictionary
     """
@@ -154,141 +297,407 @@ def backtest_strategy(data, initial_capital=100000):
         log_message("回測數據為空或格式錯誤", level="error")
         return pd.DataFrame(), pd.DataFrame(), {}
         
-    # 複製數據以避免修改原始數據
-    df = data.copy()
+    close = _values(data, 'Close')
+    signal = np.asarray(data['Signal'], dtype=np.int64).reshape(len(data), -1)[:, 0]
     
     # 初始化結果 DataFrame
-    backtest_results = pd.DataFrame(index=df.index)
-    backtest_results['Close'] = df['Close']
-    backtest_results['Signal'] = df['Signal']
-    backtest_results['Position'] = df['Position']
+    backtest_results = pd.DataFrame(index=data.index)
+    backtest_results['Close'] = close
+    backtest_results['Signal'] = signal
+    backtest_results['Position'] = np.asarray(data['Position']).reshape(len(data), -1)[:, 0]
     
-    # 初始化資金、持股數量和交易列表
-    capital = initial_capital
-    shares = 0
-    trades = []
-    in_position = False  # 是否持有股票
-    
-    # 逐行處理每個交易日
-    for i in range(len(df)):
-        # 使用 .iloc 來安全地索引單個值
-        signal = df['Signal'].iloc[i]
-        price = df['Close'].iloc[i]
-        date = df.index[i]
-        
-        # 確保日期是純量值
-        if isinstance(date, pd.Series):
-            date = date.iloc[0]
-        
-        # 買入信號處理 - 使用純量比較
-        if signal == 1 and not in_position:  # 買入信號且未持有股票
-            # 計算可買入的股數（假設全倉買入）
-            shares = int(capital // price)
-            if shares > 0:  # 確保有足夠資金買入至少一股
-                trade_value = shares * price
-                capital -= trade_value  # 扣除資金
-                in_position = True  # 設置持倉狀態
-                trades.append({
-                    'Date': date,
-                    'Type': 'Buy',
-                    'Price': float(price) if isinstance(price, pd.Series) else price,
-                    'Shares': int(shares) if isinstance(shares, pd.Series) else shares,
-                    'Value': float(trade_value) if isinstance(trade_value, pd.Series) else trade_value,
-                    'Capital': float(capital) if isinstance(capital, pd.Series) else capital
-                })
-                
-        # 賣出信號處理 - 使用純量比較
-        elif signal == -1 and in_position:  # 賣出信號且持有股票
-            if shares > 0:  # 確保有股票可賣
-                trade_value = shares * price
-                capital += trade_value  # 增加資金
-                in_position = False  # 清除持倉狀態
-                trades.append({
-                    'Date': date,
-                    'Type': 'Sell',
-                    'Price': float(price) if isinstance(price, pd.Series) else price,
-                    'Shares': int(shares) if isinstance(shares, pd.Series) else shares,
-                    'Value': float(trade_value) if isinstance(trade_value, pd.Series) else trade_value,
-                    'Capital': float(capital) if isinstance(capital, pd.Series) else capital
-                })
-                shares = 0  # 重置持股數量
-    
-    # 計算最終資產價值
-    final_value = capital
-    if shares > 0 and len(df) > 0:  # 如果還有股票未賣出
-        # 用最後一個交易日的收盤價計算剩餘股票價值
-        final_value += shares * df['Close'].iloc[-1]
+    # 成交只發生在訊號列；資產曲線與交易記錄以陣列一次算出
+    rows, sides, lots, caps, final_value = _simulate(close, signal, initial_capital)
+    backtest_results['Equity'] = _equity(close, rows, sides, lots, caps, initial_capital)
+    prices = close[rows]
     
     # 計算策略收益率
     total_return = (final_value - initial_capital) / initial_capital * 100
     
     # 計算買入並持有策略收益率
     buy_hold_return = 0
-    if len(df) >= 2:  # 至少需要兩個數據點
-        try:
-            # 使用 .iloc 安全獲取第一個和最後一個價格
-            first_price = float(df['Close'].iloc[0])
-            last_price = float(df['Close'].iloc[-1])
-            
-            # 確保安全的除法
-            if first_price > 0:  # 防止除零錯誤
-                buy_hold_return = (last_price - first_price) / first_price * 100
-        except Exception as e:
-            log_message(f"計算買入並持有收益時發生錯誤: {str(e)}", level="warning")
+    if len(close) >= 2 and close[0] > 0:  # 至少需要兩個數據點，並防止除零錯誤
+        buy_hold_return = (close[-1] - close[0]) / close[0] * 100
     
     # 創建交易記錄 DataFrame
     trades_df = pd.DataFrame()
-    if trades:  # 如果有交易記錄
-        # 確保所有交易記錄中的值都是標量
-        clean_trades = []
-        for trade in trades:
-            clean_trade = {
-                'Date': trade['Date'],
-                'Type': trade['Type'],
-                'Price': float(trade['Price']) if isinstance(trade['Price'], pd.Series) else trade['Price'],
-                'Shares': int(trade['Shares']) if isinstance(trade['Shares'], pd.Series) else trade['Shares'],
-                'Value': float(trade['Value']) if isinstance(trade['Value'], pd.Series) else trade['Value'],
-                'Capital': float(trade['Capital']) if isinstance(trade['Capital'], pd.Series) else trade['Capital']
-            }
-            clean_trades.append(clean_trade)
-            
-        trades_df = pd.DataFrame(clean_trades)
+    if len(rows):
+        trades_df = pd.DataFrame({
+            'Date': data.index[rows],
+            'Type': np.where(sides == 1, 'Buy', 'Sell'),
+            'Price': prices,
+            'Shares': lots,
+            'Value': lots * prices,
+            'Capital': caps,
+        })
         trades_df.set_index('Date', inplace=True)
     
     # 統計信息
     stats = {
-        'Initial Capital': float(initial_capital),  # 確保所有數值都是基本類型而非 Series
+        'Initial Capital': float(initial_capital),
         'Final Value': float(final_value),
         'Total Return (%)': float(total_return),
         'Buy & Hold Return (%)': float(buy_hold_return),
-        'Number of Trades': len(trades),
+        'Number of Trades': len(rows),
         'Win Rate (%)': 0.0
     }
     
-    # 計算勝率
-    if len(trades) >= 2:  # 至少需要一組買賣交易
-        buy_trades = [t for t in trades if t['Type'] == 'Buy']
-        sell_trades = [t for t in trades if t['Type'] == 'Sell']
-        
-        if buy_trades and sell_trades:  # 確保有買入和賣出記錄
-            # 計算獲利交易次數
-            wins = 0
-            pairs = min(len(buy_trades), len(sell_trades))  # 取較小值，確保成對
-            
-            for i in range(pairs):
-                # 確保比較的是純量值而非Series
-                buy_price = float(buy_trades[i]['Price']) if isinstance(buy_trades[i]['Price'], pd.Series) else buy_trades[i]['Price']
-                sell_price = float(sell_trades[i]['Price']) if isinstance(sell_trades[i]['Price'], pd.Series) else sell_trades[i]['Price']
-                
-                # 如果賣出價高於買入價，則為盈利交易
-                if sell_price > buy_price:
-                    wins += 1
-            
-            # 計算勝率
-            stats['Win Rate (%)'] = float((wins / pairs) * 100 if pairs > 0 else 0)
+    # 計算勝率（至少需要一組買賣交易）
+    if len(rows) >= 2:
+        stats['Win Rate (%)'] = _win_rate(prices[sides == 1], prices[sides == -1])
     
     return backtest_results, trades_df, stats
 
+# === 參數掃描 ===
+# 每個不同的均線窗口只算一次，收盤價與均線矩陣放在共享記憶體，由多個行程分批評估 (short, long) 組合
+
+SWEEP_COLUMNS = ['Initial Capital', 'short_window', 'long_window',
+                 'Total Return (%)', 'Win Rate (%)', 'Number of Trades']
+_sweep = {}
+
+def _rolling_means(close, windows):
+    """各窗口的移動平均（與 calculate_ma 相同算法），回傳 (窗口數 + 1) x n 矩陣，第 0 列為收盤價"""
+    series = pd.Series(close)
+    matrix = np.empty((len(windows) + 1, len(close)))
+    matrix[0] = close
+    for i, window in enumerate(windows):
+        matrix[i + 1] = series.rolling(window=window).mean().to_numpy()
+    return matrix
+
+def _sweep_attach(name, shape, windows):
+    # 子行程：掛上主行程建立的共享記憶體（唯讀使用，由主行程負責釋放）
+    shm = shared_memory.SharedMemory(name=name)
+    _sweep_use(shm, np.ndarray(shape, dtype=float, buffer=shm.buf), windows)
+
+def _sweep_use(shm, matrix, windows):
+    _sweep.update(shm=shm, close=matrix[0], ma={w: matrix[i + 1] for i, w in enumerate(windows)})
+
+def _pair_signal(short_window, long_window):
+    """整段歷史的交叉訊號；每個組合在每個行程只算一次，各區段直接切片"""
+    signals = _sweep.setdefault('signals', {})
+    key = (short_window, long_window)
+    if key not in signals:
+        signals[key] = cross_signals(_sweep['ma'][short_window], _sweep['ma'][long_window])
+    return signals[key]
+
+def _map_shared(fn, tasks, matrix, windows, workers):
+    """
+    對每個 task 執行 fn(*task)，fn 透過 _sweep 讀取收盤價與均線矩陣
+    workers > 1 時矩陣放在共享記憶體交給行程池，否則在本行程直接執行
+    """
+    if workers == 1:
+        _sweep_use(None, matrix, windows)
+        try:
+            return [fn(*task) for task in tasks]
+        finally:
+            _sweep.clear()
+    shm = shared_memory.SharedMemory(create=True, size=matrix.nbytes)
+    try:
+        np.ndarray(matrix.shape, dtype=float, buffer=shm.buf)[:] = matrix
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_sweep_attach,
+            initargs=(shm.name, matrix.shape, windows),
+        ) as ex:
+            futures = [ex.submit(fn, *task) for task in tasks]
+            return [f.result() for f in futures]
+    finally:
+        shm.close()
+        shm.unlink()
+
+def _sweep_chunk(pairs, capitals):
+    close = _sweep['close']
+    rows = []
+    for short_window, long_window in pairs:
+        signal = _pair_signal(short_window, long_window)
+        for capital in capitals:
+            rows.append((capital, short_window, long_window) + _evaluate(close, signal, capital))
+    return rows
+
+def _workers(workers, tasks):
+    return max(1, min(workers or os.cpu_count() or 1, tasks))
+
+def sweep_ma(data, short_windows, long_windows, capitals=(100000,), workers=None):
+    """
+    均線交叉參數掃描
+    
+    參數:
+    - data: 股票數據 DataFrame（需含 Close）
+    - short_windows / long_windows: 短期、長期窗口的範圍（只評估 short < long 的組合）
+    - capitals: 初始資金（可多個）
+    - workers: 行程數（預設 CPU 核心數，1 表示不開子行程）
+    
+    返回:
+    - 每個組合一列的 DataFrame（index：Initial Capital、short_window、long_window；
+      欄：Total Return (%)、Win Rate (%)、Number of Trades），
+      可用 .unstack('long_window') 轉成網格
+    """
+    if not isinstance(data, pd.DataFrame) or data.empty:
+        log_message("參數掃描數據為空或格式錯誤", level="error")
+        return pd.DataFrame(columns=SWEEP_COLUMNS).set_index(SWEEP_COLUMNS[:3])
+    
+    pairs = [(s, l) for s in short_windows for l in long_windows if s < l]
+    windows = sorted({w for pair in pairs for w in pair})
+    capitals = list(capitals)
+    matrix = _rolling_means(_values(data, 'Close'), windows)
+    workers = _workers(workers, len(pairs))
+    chunks = [(pairs[i::workers * 4], capitals) for i in range(workers * 4)]
+    results = _map_shared(_sweep_chunk, [c for c in chunks if c[0]], matrix, windows, workers)
+    rows = [row for chunk in results for row in chunk]
+    
+    log_message(f"參數掃描完成：{len(pairs)} 組窗口 x {len(capitals)} 種資金")
+    result = pd.DataFrame(rows, columns=SWEEP_COLUMNS).set_index(SWEEP_COLUMNS[:3])
+    return result.sort_index()
+
+# === Walk-forward ===
+# 均線與交叉訊號在整段歷史上只算一次（兩者都只用到過去資料），各 fold 的訓練 / 測試區段直接切片
+
+WF_METRICS = {'Total Return (%)': 0, 'Win Rate (%)': 1}
+
+def _wf_train(start, end, pairs, capital, metric):
+    """訓練區段內選出 metric 最高的組合（同分取先出現者），回傳 (組合, (報酬, 勝率, 交易次數))"""
+    close = _sweep['close'][start:end]
+    best = None
+    for pair in pairs:
+        result = _evaluate(close, _pair_signal(*pair)[start:end], capital)
+        if best is None or result[metric] > best[1][metric]:
+            best = (pair, result)
+    return best
+
+def _wf_folds(n, train_size, test_size):
+    """(訓練起點, 訓練終點 = 測試起點, 測試終點)，每次往後推一個測試區段；最後一段可不足 test_size"""
+    folds = []
+    start = 0
+    while start + train_size < n:
+        folds.append((start, start + train_size, min(start + train_size + test_size, n)))
+        start += test_size
+    return folds
+
+def walk_forward(data, short_windows, long_windows, train_size=504, test_size=63,
+                 initial_capital=100000, metric='Total Return (%)', workers=None):
+    """
+    Walk-forward 均線交叉最佳化
+    
+    參數:
+    - data: 股票數據 DataFrame（需含 Close）
+    - short_windows / long_windows: 候選窗口範圍（只評估 short < long 的組合）
+    - train_size / test_size: 訓練、測試區段的 K 棒數；每個 fold 往後推一個測試區段
+    - initial_capital: 初始資金
+    - metric: 訓練區段的選參依據（Total Return (%) 或 Win Rate (%)）
+    - workers: 行程數（各 fold 的訓練並行執行）
+    
+    返回:
+    - 樣本外資產曲線 Series（各測試區段串接，資金接續上一段期末市值，區段結束時視同出清）
+    - 每個 fold 一列的報告 DataFrame
+    """
+    if not isinstance(data, pd.DataFrame) or data.empty:
+        log_message("Walk-forward 數據為空或格式錯誤", level="error")
+        return pd.Series(dtype=float), pd.DataFrame()
+    
+    close = _values(data, 'Close')
+    folds = _wf_folds(len(close), train_size, test_size)
+    pairs = [(s, l) for s in short_windows for l in long_windows if s < l]
+    if not folds or not pairs:
+        log_message("資料長度不足或沒有可用的窗口組合", level="warning")
+        return pd.Series(dtype=float), pd.DataFrame()
+    
+    windows = sorted({w for pair in pairs for w in pair})
+    matrix = _rolling_means(close, windows)
+    tasks = [(start, mid, pairs, initial_capital, WF_METRICS[metric]) for start, mid, _ in folds]
+    best = _map_shared(_wf_train, tasks, matrix, windows, _workers(workers, len(folds)))
+    
+    # 測試區段依序執行，資金接續
+    index = {w: i + 1 for i, w in enumerate(windows)}
+    capital = initial_capital
+    curves, report = [], []
+    for k, ((start, mid, end), ((s, l), train)) in enumerate(zip(folds, best)):
+        signal = cross_signals(matrix[index[s]], matrix[index[l]])[mid:end]
+        test_close = close[mid:end]
+        rows, sides, lots, caps, final_value = _simulate(test_close, signal, capital)
+        curves.append(_equity(test_close, rows, sides, lots, caps, capital))
+        prices = test_close[rows]
+        report.append({
+            'fold': k,
+            'train_start': data.index[start],
+            'train_end': data.index[mid - 1],
+            'test_start': data.index[mid],
+            'test_end': data.index[end - 1],
+            'short_window': s,
+            'long_window': l,
+            f'Train {metric}': train[WF_METRICS[metric]],
+            'Test Return (%)': (final_value - capital) / capital * 100,
+            'Test Win Rate (%)': _win_rate(prices[sides == 1], prices[sides == -1]) if len(rows) >= 2 else 0.0,
+            'Test Trades': len(rows),
+            'Start Capital': float(capital),
+            'End Capital': final_value,
+        })
+        capital = final_value
+    
+    equity = pd.Series(np.concatenate(curves), index=data.index[folds[0][1]:folds[-1][2]], name='Equity')
+    log_message(f"Walk-forward 完成：{len(folds)} 個 fold，樣本外報酬 {(capital - initial_capital) / initial_capital * 100:.2f}%")
+    return equity, pd.DataFrame(report).set_index('fold')
+
+# === 多檔投資組合 ===
+# 單一現金池、多檔股票同時回測：時間軸逐步前進，每一步對所有股票做向量化運算
+
+PORTFOLIO_LEDGER_COLUMNS = ['Type', 'Price', 'Shares', 'Value']
+
+def ma_cross_panel(closes, short_window=5, long_window=20):
+    """
+    多檔股票的均線交叉訊號
+    
+    參數:
+    - closes: 收盤價面板 DataFrame（index 日期、欄為股票代碼）
+    
+    返回:
+    - 與 closes 同形狀的訊號 DataFrame（1 買進、-1 賣出、0 無）
+    """
+    short_ma = closes.rolling(window=short_window).mean().to_numpy()
+    long_ma = closes.rolling(window=long_window).mean().to_numpy()
+    return pd.DataFrame(cross_signals(short_ma, long_ma), index=closes.index, columns=closes.columns)
+
+def _target_weight(held, allocation, max_weight):
+    """每檔持股的目標權重：equal 為 1/持股數；capped 另以 max_weight 為上限"""
+    weight = 1.0 / held if held else 0.0
+    if allocation == 'capped' and max_weight is not None:
+        weight = min(weight, max_weight)
+    return weight
+
+def backtest_portfolio(closes, signals, initial_capital=1000000, allocation='equal',
+                       max_weight=None, rebalance=None):
+    """
+    多檔股票投資組合回測（單一現金池）
+    
+    參數:
+    - closes: 收盤價面板 DataFrame（index 日期、欄為股票代碼；未上市 / 停牌為 NaN）
+    - signals: 訊號 DataFrame（依日期與代碼對齊 closes）、同形狀的陣列，
+      或 signals(closes) -> 訊號的函式（如 ma_cross_panel）
+    - initial_capital: 初始資金
+    - allocation: 'equal'（持股等權重）或 'capped'（等權重但單檔不超過 max_weight）
+    - max_weight: capped 時單檔權重上限（如 0.1）
+    - rebalance: 每隔幾根 K 棒把所有持股調回目標權重（None 表示只在進場時配置）
+    
+    規則:
+    - 同一根 K 棒先處理賣出訊號（全數出清）再處理買進訊號
+    - 進場金額為 目標權重 x 當時總資產，現金不足時依比例縮小；股數取整數
+    - 價格為 NaN 的股票當日不可交易，市值以最近一次收盤價計算
+    
+    返回:
+    - 回測結果 DataFrame（Equity、Cash、Holdings 持股檔數）
+    - 各股票的交易記錄 dict（代碼 -> DataFrame）
+    - 統計數據 Dictionary
+    """
+    if not isinstance(closes, pd.DataFrame) or closes.empty:
+        log_message("投資組合回測數據為空或格式錯誤", level="error")
+        return pd.DataFrame(), {}, {}
+    if callable(signals):
+        signals = signals(closes)
+    
+    raw = closes.to_numpy(dtype=float)
+    tradable = ~np.isnan(raw)
+    marks = closes.ffill().fillna(0).to_numpy(dtype=float)  # 市值計算用價格
+    if isinstance(signals, pd.DataFrame):
+        # 依日期與代碼對齊，而非依位置；訊號沒有的日期 / 代碼視為 0
+        signals = signals.reindex(index=closes.index, columns=closes.columns).fillna(0)
+    signal = np.asarray(signals, dtype=np.int64)
+    if signal.shape != raw.shape:
+        raise ValueError(f"signals 形狀 {signal.shape} 與 closes {raw.shape} 不符")
+    n_bars, n_symbols = raw.shape
+    
+    cash = float(initial_capital)
+    shares = np.zeros(n_symbols, dtype=np.int64)
+    cost = np.zeros(n_symbols)  # 持股成本（用於勝率）
+    equity = np.empty(n_bars)
+    cash_curve = np.empty(n_bars)
+    held_curve = np.empty(n_bars, dtype=np.int64)
+    fills = []  # (K 棒, 股票, 股數變化, 價格)
+    wins = exits_count = 0
+    
+    for t in range(n_bars):
+        price = marks[t]
+        can_trade = tradable[t]
+        
+        # 賣出：出清有賣出訊號的持股
+        sell = (signal[t] == -1) & (shares > 0) & can_trade
+        if sell.any():
+            proceeds = shares[sell] * price[sell]
+            cash += proceeds.sum()
+            wins += np.count_nonzero(proceeds > cost[sell])
+            exits_count += np.count_nonzero(sell)
+            fills.append((t, np.flatnonzero(sell), -shares[sell], price[sell]))
+            shares[sell] = 0
+            cost[sell] = 0
+        
+        buy = (signal[t] == 1) & (shares == 0) & can_trade & (price > 0)
+        total = cash + shares @ price
+        due = rebalance is not None and t > 0 and t % rebalance == 0
+        if not buy.any() and not due:
+            equity[t], cash_curve[t], held_curve[t] = total, cash, np.count_nonzero(shares)
+            continue
+        
+        # 目標持股：既有持股 + 新進場
+        hold = (shares > 0) | buy
+        weight = _target_weight(np.count_nonzero(hold), allocation, max_weight)
+        target = np.zeros(n_symbols, dtype=np.int64)
+        valid = hold & (price > 0)
+        target[valid] = np.floor(weight * total / price[valid])
+        resize = (buy | (hold & can_trade)) if due else buy
+        delta = np.where(resize, target - shares, 0)
+        
+        # 先減碼取得現金，再加碼（現金不足時等比例縮小）
+        down = delta < 0
+        if down.any():
+            cash -= (delta[down] * price[down]).sum()
+            cost[down] *= (shares[down] + delta[down]) / shares[down]
+        up = delta > 0
+        if up.any():
+            need = (delta[up] * price[up]).sum()
+            if need > cash:
+                delta[up] = np.floor(delta[up] * (cash / need))
+                up = delta > 0
+            cash -= (delta[up] * price[up]).sum()
+            cost[up] += delta[up] * price[up]
+        changed = np.flatnonzero(delta)
+        if len(changed):
+            fills.append((t, changed, delta[changed], price[changed]))
+        shares += delta
+        equity[t], cash_curve[t], held_curve[t] = cash + shares @ price, cash, np.count_nonzero(shares)
+    
+    results = pd.DataFrame({'Equity': equity, 'Cash': cash_curve, 'Holdings': held_curve}, index=closes.index)
+    ledgers = _portfolio_ledgers(closes, fills)
+    final_value = float(equity[-1])
+    peak = np.maximum.accumulate(equity)
+    stats = {
+        'Initial Capital': float(initial_capital),
+        'Final Value': final_value,
+        'Total Return (%)': (final_value - initial_capital) / initial_capital * 100,
+        'Max Drawdown (%)': float(((equity - peak) / peak).min() * 100),
+        'Number of Trades': sum(len(f[1]) for f in fills),
+        'Win Rate (%)': float(wins / exits_count * 100) if exits_count else 0.0,
+        'Symbols': n_symbols,
+    }
+    return results, ledgers, stats
+
+def _portfolio_ledgers(closes, fills):
+    """把逐步累積的成交整理成各股票的交易記錄"""
+    if not fills:
+        return {}
+    bars = np.concatenate([np.full(len(f[1]), f[0]) for f in fills])
+    symbols = np.concatenate([f[1] for f in fills])
+    deltas = np.concatenate([f[2] for f in fills])
+    prices = np.concatenate([f[3] for f in fills])
+    ledger = pd.DataFrame({
+        'Date': closes.index[bars],
+        'Symbol': closes.columns[symbols],
+        'Type': np.where(deltas > 0, 'Buy', 'Sell'),
+        'Price': prices,
+        'Shares': np.abs(deltas),
+        'Value': np.abs(deltas) * prices,
+    })
+    return {
+        symbol: group.set_index('Date')[PORTFOLIO_LEDGER_COLUMNS]
+        for symbol, group in ledger.groupby('Symbol', sort=False)
+    }
+
 def plot_backtest_results(data, trades_df):
     """
     繪製回測結果圖
@@ -1,40 +1,50 @@
 import streamlit as st
-import httpx
 import asyncio
-import requests
 import numpy as np
 import pandas as pd
 import json
-from datetime import date, datetime, timedelta
-from io import StringIO
-import time
-from bs4 import BeautifulSoup
+from datetime import date, datetime, time as dt_time
+from lxml import html as lxml_html
+from stock_core import http_client, store
+from stock_core.t86 import rank, t86_table
+from stock_core.trading_calendar import latest_trading_day, probe_sessions, sessions_between
+
+T86_READY = dt_time(16, 0)  # 三大法人買賣超公布時間
 
 async def fetch_data_async(datestr):
     url = f"https://www.twse.com.tw/rwd/zh/fund/T86?date={datestr}&selectType=ALL&response=json&_=1687956428483"
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-        data = response.json()
-        return data
+    response = await http_client.aget(url)
+    data = response.json()
+    return data
+
+async def _fetch_data_many(datestrs):
+    return await asyncio.gather(*(fetch_data_async(d) for d in datestrs), return_exceptions=True)
 
 @st.cache_data(ttl=3600)
-def fetch_data(max_attempts=5):
-    now = datetime.now()
-    for _ in range(max_attempts):
-        datestr = now.strftime("%Y%m%d")
-        data = asyncio.run(fetch_data_async(datestr))
-        if data.get("total", 1) == 0:
-            print(f"No data for date {datestr}, trying the previous day.")
-            now -= timedelta(days=1)
-            continue
-        else:
-            df = pd.DataFrame(data["data"], columns=data["fields"])
-            return df, now.strftime("%Y-%m-%d")
+def fetch_data(max_attempts=2):
+    # 由交易日曆決定候選日期，每次同時查 max_attempts 天，取最新一個有資料的交易日
+    # 超出休市日資料範圍時候選日較多，依序一批批往前探測
+    latest = latest_trading_day(ready=T86_READY)
+    days = list(reversed(probe_sessions(max_attempts, latest)))
+    for i in range(0, len(days), max_attempts):
+        batch = days[i:i + max_attempts]
+        results = http_client.run(_fetch_data_many([d.strftime("%Y%m%d") for d in batch]))
+        for day, data in zip(batch, results):
+            datestr = day.strftime("%Y%m%d")
+            if isinstance(data, Exception):
+                print(f"Fetch failed for date {datestr}: {data}")
+                continue
+            if data.get("total", 1) == 0:
+                print(f"No data for date {datestr}, trying the previous trading day.")
+                continue
+            else:
+                df = pd.DataFrame(data["data"], columns=data["fields"])
+                return df, day.strftime("%Y-%m-%d")
     return pd.DataFrame(), ""
 
 @st.cache_data(ttl=3600)
 def three_data():
-    response = httpx.get("https://www.twse.com.tw/rwd/zh/fund/BFI82U?response=json")
+    response = http_client.get("https://www.twse.com.tw/rwd/zh/fund/BFI82U?response=json")
     data = response.json()
     data_list = data["data"]
     data_date = data["date"]
@@ -44,11 +54,9 @@ def three_data():
 
 @st.cache_data(ttl=3600)
 def turnover():
-    now = datetime.now()
-    datestr = now.strftime("%Y%m%d")
+    datestr = latest_trading_day().strftime("%Y%m%d")
     url = f"https://www.twse.com.tw/rwd/zh/afterTrading/FMTQIK?date={datestr}&response=json&_=1687090997495"
-    response = requests.get(url)
-    time.sleep(1)
+    response = http_client.get(url)
     data = response.json()
     data_list = data["data"]
     df = pd.DataFrame(data_list, columns=data["fields"])
@@ -59,141 +67,181 @@ def turnover():
 
     return new_df
 
+@st.cache_data(ttl=3600)
+def t86_data():
+    """T86 只解析一次：以證券代號為 index 的型別化表 + 資料日期"""
+    df, data_date = fetch_data()
+    return t86_table(df), data_date
+
+def _buy_sell(col, k=50):
+    # 前 k 名以部分選取取得（不做全排序）；df_all 為未排序的非 0 全體
+    df, data_date = t86_data()
+    df_all = df.loc[df[col] != 0, ['證券名稱', col]].reset_index()
+    df_buy_top, df_sell_top = rank(df, col, k)
+    return df_all, df_buy_top, df_sell_top, data_date
+
 # @st.cache_data
 @st.cache_data(ttl=3600)
 def for_buy_sell():
-    df, data_date = fetch_data()
-    df_for = df[['證券代號','證券名稱','外陸資買賣超股數(不含外資自營商)']].copy()
-    df_for['外陸資買賣超股數(不含外資自營商)'] = df_for['外陸資買賣超股數(不含外資自營商)'].str.replace(',', '')
-    df_for['外陸資買賣超股數(不含外資自營商)'] = pd.to_numeric(df_for['外陸資買賣超股數(不含外資自營商)'], errors='coerce')
-    df_for.rename(columns={'外陸資買賣超股數(不含外資自營商)': '外資買賣超股數'}, inplace=True)
-    df_for_all = df_for[df_for['外資買賣超股數'].notna() & (df_for['外資買賣超股數'] != 0)]
-    df_for_all = df_for_all.sort_values('外資買賣超股數', ascending=False)
-    df_for_all2 = df_for_all.sort_values('外資買賣超股數', ascending=True)
-    df_buy_top50 = df_for_all.head(50)
-    df_sell_top50 = df_for_all2.head(50)
-    return df_for_all, df_buy_top50, df_sell_top50, data_date
+    return _buy_sell('外資買賣超股數')
 
 # @st.cache_data
 @st.cache_data(ttl=3600)
 def ib_buy_sell():
-    df, data_date = fetch_data()
-    df_ib = df[['證券代號','證券名稱','投信買賣超股數']].copy()
-    df_ib['投信買賣超股數'] = df_ib['投信買賣超股數'].str.replace(',', '')
-    df_ib['投信買賣超股數'] = pd.to_numeric(df_ib['投信買賣超股數'], errors='coerce')
-    df_ib_all = df_ib[df_ib['投信買賣超股數'].notna() & (df_ib['投信買賣超股數'] != 0)]
-    df_ib_all = df_ib_all.sort_values('投信買賣超股數', ascending=False)
-    df_ib_all2 = df_ib_all.sort_values('投信買賣超股數', ascending=True)
-    df_buy_top50 = df_ib_all.head(50)
-    df_sell_top50 = df_ib_all2.head(50)
-    return df_ib_all, df_buy_top50, df_sell_top50, data_date
+    return _buy_sell('投信買賣超股數')
 
 # @st.cache_data
 def for_ib_common():
-    df_for_all, _, _, data_date = for_buy_sell()
-    df_ib_all, _, _, data_date= ib_buy_sell()
-    df_com_buy = pd.merge(df_for_all, df_ib_all, on='證券代號')
-    df_com_buy.drop('證券名稱_y', axis=1, inplace=True)
-    df_com_buy.rename(columns={'證券名稱_x': '證券名稱', '外陸資買賣超股數(不含外資自營商)': '外資買賣超股數'}, inplace=True)
-    df_com_buy = df_com_buy[(df_com_buy['外資買賣超股數'] >= 0) & (df_com_buy['投信買賣超股數'] >= 0)]
-    df_com_buy = df_com_buy.sort_values(by='投信買賣超股數', ascending=False)
+    df, data_date = t86_data()
+    df_for, df_ib = df['外資買賣超股數'], df['投信買賣超股數']
+    df_com_buy = df.loc[(df_for > 0) & (df_ib > 0), ['證券名稱', '外資買賣超股數', '投信買賣超股數']]
+    df_com_buy = df_com_buy.reset_index().sort_values(by='投信買賣超股數', ascending=False)
     return df_com_buy, data_date
 
+FX_HISTORY_URL = "https://rate.bot.com.tw/xrt/quote/{span}/USD"
+FX_REFRESH_SECONDS = 3600  # 當日最新匯率尚未入庫時，最多每小時向台銀查一次
+FX_WINDOW_MONTHS = 6  # 回傳的期間，與原本台銀 l6m 頁面相同；本地仍保留完整歷史
+_UTF8_HTML = lxml_html.HTMLParser(encoding='utf-8')
+
+def parse_bot_history(content):
+    """
+    用 lxml XPath 只取「歷史本行營業時間牌告匯率」表中的日期與現金買入/賣出
+    回傳以 date（YYYY/MM/DD）為 index 的 buy_rate / sell_rate
+    """
+    tree = lxml_html.fromstring(content, parser=_UTF8_HTML)
+    rows = tree.xpath("//table[@title='歷史本行營業時間牌告匯率']/tbody/tr[td/a]")
+    dates, buys, sells = [], [], []
+    for row in rows:
+        cash = row.xpath("td[@class='rate-content-cash text-right print_table-cell']/text()")
+        dates.append(row.xpath("string(td/a)").strip())
+        buys.append(float(cash[0]))  # 歷史買入匯率
+        sells.append(float(cash[1]))  # 歷史賣出匯率
+    df = pd.DataFrame({'date': dates, 'buy_rate': buys, 'sell_rate': sells})
+    df['date'] = pd.to_datetime(df['date'], format='%Y/%m/%d').dt.strftime('%Y/%m/%d')
+    return df.set_index('date')
+
 def exchange_rate():
-    # 先到牌告匯率首頁，爬取所有貨幣的種類
-    url = "https://rate.bot.com.tw/xrt?Lang=zh-TW"
-    resp = requests.get(url)
-    resp.encoding = 'utf-8'
-    html = BeautifulSoup(resp.text, "lxml")
-    rate_table = html.find(name='table', attrs={'title':'牌告匯率'}).find(name='tbody').find_all(name='tr')
-
-    # 擷取匯率表格，把美金(也就是匯率表的第一個元素)擷取出來，查詢其歷史匯率
-    currency = rate_table[0].find(name='div', attrs={'class':'visible-phone print_hide'})
-    # print(currency.get_text().replace(" ", ""))  # 貨幣種類
-
-    buy_rate = rate_table[0].find(name='td', attrs={'data-table':'本行現金買入'})
-    sell_rate = rate_table[0].find(name='td', attrs={'data-table':'本行現金賣出'})
-    # print("即時現金買入: %s, 即時現金賣出: %s" % (buy_rate.get_text(), sell_rate.get_text()))
-    # 針對美金，找到其「歷史匯率」的首頁 
-    history_link = rate_table[0].find(name='td', attrs={'data-table':'歷史匯率'})
-    # history_rate_link = "https://rate.bot.com.tw" + history_link.a["href"]  # 該貨幣的歷史資料首頁
-    history_rate_link = "https://rate.bot.com.tw/xrt/quote/l6m/USD"
-    # print(history_rate_link)
-
-    #
-    # 到貨幣歷史匯率網頁，選則該貨幣的「歷史區間」，送出查詢後，觀察其網址變化情形，再試著抓取其歷史匯率資料
-    #
-    # 用「quote/年-月」去取代網址內容，就可以連到該貨幣的歷史資料
-    quote_history_url = history_rate_link.replace("history", "quote/2019-08")
-    resp = requests.get(quote_history_url)
-    resp.encoding = 'utf-8'
-    history = BeautifulSoup(resp.text, "lxml")
-    history_table = history.find(name='table', attrs={'title':'歷史本行營業時間牌告匯率'}).find(name='tbody').find_all(name='tr')
-
-    #
-    # 擷取到歷史匯率資料後，把資料彙整起來並畫出趨勢圖
-    #
-    date_history = list()
-    history_buy = list()
-    history_sell = list()
-
-    for history_rate in history_table:
-        # 擷取日期資料
-        if history_rate.a is None:
-            continue
-        
-        date_string = history_rate.a.get_text()
-        date = datetime.strptime(date_string, '%Y/%m/%d').strftime('%Y/%m/%d')  # 轉換日期格式
-        date_history.append(date)  # 日期歷史資料
-
-        history_ex_rate = history_rate.find_all(name='td', attrs={'class':'rate-content-cash text-right print_table-cell'})
-        history_buy.append(float(history_ex_rate[0].get_text()))  # 歷史買入匯率
-        history_sell.append(float(history_ex_rate[1].get_text()))  # 歷史賣出匯率
-
-        # 將匯率資料建成dataframe形式
-    History_ExchangeRate = pd.DataFrame({'date': date_history,
-                                        'buy_rate':history_buy,
-                                        'sell_rate':history_sell})
-
-    History_ExchangeRate = History_ExchangeRate.set_index('date')  # 指定日期欄位為datafram的index
+    """
+    美元/台幣現金匯率歷史（台灣銀行），回傳最近 FX_WINDOW_MONTHS 個月
+    完整歷史存在本地，只下載缺少的月份；當日已入庫或剛更新過時直接讀本地
+    """
+    cutoff = (pd.Timestamp.now() - pd.DateOffset(months=FX_WINDOW_MONTHS)).strftime('%Y/%m/%d')
+    path = store.data_path("fx", "USD.parquet")
+    stored = store.read_frame(path)
+    age = store.file_age(path)
+    latest = latest_trading_day(ready=T86_READY).strftime('%Y/%m/%d')
+    if stored is not None and not stored.empty and (
+        stored.index[-1] >= latest or (age is not None and age < FX_REFRESH_SECONDS)
+    ):
+        return stored[stored.index >= cutoff]
+
+    if stored is None or stored.empty:
+        spans = ["l6m"]  # 第一次：近六個月
+    else:
+        last = datetime.strptime(stored.index[-1], '%Y/%m/%d')
+        spans = pd.period_range(last, datetime.now(), freq='M').strftime('%Y-%m')
+    frames = [stored] if stored is not None else []
+    for span in spans:
+        resp = http_client.get(FX_HISTORY_URL.format(span=span))
+        frames.append(parse_bot_history(resp.content))
+    History_ExchangeRate = pd.concat(frames)
+    History_ExchangeRate = History_ExchangeRate[~History_ExchangeRate.index.duplicated(keep='last')]
     History_ExchangeRate = History_ExchangeRate.sort_index(ascending=True)
-
-    # print(History_ExchangeRate)
-    return History_ExchangeRate
-
-def futures():
-    url = 'https://www.taifex.com.tw/cht/3/futContractsDate'
-
-    # 使用read_html解析
-    tables = pd.read_html(url)
-    df = tables[2]
-    df = df.dropna(how='all', axis=0).dropna(how='all', axis=1)
-
-    # 自訂欄位名稱
-    headers = [
-        "序號", "商品名稱", "身份別",
-        "多方口數", "多方交易契約金額",
-        "空方口數", "空方契約金額",
-        "多空淨額口數", "多空淨額契約金額",
-        "多方未平倉口數", "多方未平倉契約金額",
-        "空方未平倉口數", "空方未平倉契約金額",
-        "多空淨額未平倉口數", "多空淨額未平倉契約金額"
-    ]
-
-    df.columns = headers
-    df = df[5:].reset_index(drop=True)
-
-    # 使用新的列名稱進行過濾
-    df = df[~df['序號'].str.contains('期貨合計|期貨小計|序 號', na=False)]
-    df = df[df['商品名稱'] == '臺股期貨']
-
-    selected_columns = ["多空淨額未平倉口數", "多空淨額未平倉契約金額"]
-    df = df.loc[:, selected_columns]
-
-    new_index = ["自營商", "投信", "外資"]
-    df.index = new_index
+    store.write_frame(History_ExchangeRate, path)
+    return History_ExchangeRate[History_ExchangeRate.index >= cutoff]
+
+TAIFEX_FUT_URL = 'https://www.taifex.com.tw/cht/3/futContractsDate'
+TAIFEX_READY = dt_time(15, 0)  # 期貨三大法人未平倉公布時間
+FUT_IDENTITIES = ["自營商", "投信", "外資"]
+FUT_COLUMNS = ["多空淨額未平倉口數", "多空淨額未平倉契約金額"]
+FUT_NO_DATA = "查無資料"  # 期交所查詢日無交易時的頁面文字
+_fut_oi = store.DatePartitionedStore("taifex_tx_oi")
+
+def parse_tx_oi(content):
+    """
+    只取 futContractsDate 中「臺股期貨」三列（自營商/投信/外資）的多空淨額未平倉
+    不解析頁面上其他表格；查無資料時回傳空 DataFrame
+    """
+    tree = lxml_html.fromstring(content, parser=_UTF8_HTML)
+    first = tree.xpath("//tr[td[normalize-space()='臺股期貨']]")
+    if not first:
+        return pd.DataFrame(columns=["身份別"] + FUT_COLUMNS)
+    rows = [first[0]] + first[0].xpath("following-sibling::tr[position() <= 2]")
+    records = []
+    for row in rows:
+        cells = [td.xpath("normalize-space()") for td in row.xpath("td")]
+        for i, cell in enumerate(cells):
+            label = next((n for n in FUT_IDENTITIES if n in cell), None)
+            if label:
+                break
+        nums = [int(c.replace(",", "")) for c in cells[i + 1:]]
+        records.append((label, nums[-2], nums[-1]))
+    return pd.DataFrame(records, columns=["身份別"] + FUT_COLUMNS)
+
+def _fut_form(day):
+    return {"queryType": "1", "doQuery": "1", "queryDate": day.strftime("%Y/%m/%d"), "commodityId": "TXF"}
+
+def _store_fut_oi(day, resp):
+    """
+    解析並存入一天的未平倉；只有頁面明確寫「查無資料」（休市）才把空白日期標記為已查詢，
+    錯誤頁、限流頁或版面改變時不寫入，下次再查
+    """
+    resp.raise_for_status()
+    df = parse_tx_oi(resp.content)
+    key = day.strftime("%Y-%m-%d")
+    if not df.empty:
+        df.insert(0, "date", key)
+        _fut_oi.write(df, key, key)
+    elif FUT_NO_DATA in resp.content.decode("utf-8", errors="ignore"):
+        _fut_oi.write(None, key, key)
+    else:
+        print(f"futures {key}: 找不到臺股期貨未平倉，也不是查無資料頁面，暫不標記")
     return df
 
+def futures(day=None):
+    """
+    臺股期貨三大法人多空淨額未平倉（index：自營商/投信/外資）
+    以交易日為鍵存在本地，同一交易日只向期交所查一次；當日尚未公布時退回前一交易日
+    """
+    latest = day or latest_trading_day(ready=TAIFEX_READY)
+    for d in reversed(probe_sessions(2, latest)):
+        key = d.strftime("%Y-%m-%d")
+        if key not in _fut_oi.covered():
+            resp = http_client.post(TAIFEX_FUT_URL, data=_fut_form(d))
+            _store_fut_oi(d, resp)
+        df = _fut_oi.read(key, key)
+        if not df.empty:
+            return df.set_index("身份別").loc[FUT_IDENTITIES, FUT_COLUMNS]
+    return pd.DataFrame(columns=FUT_COLUMNS)
+
+def futures_history(start, end=None):
+    """
+    臺股期貨三大法人淨未平倉口數歷史（index：日期，欄：自營商/投信/外資）
+    缺少的交易日並行補抓（受 TWSE/TAIFEX 主機速率限制），已存的日期直接讀本地
+    """
+    end = end or latest_trading_day(ready=TAIFEX_READY)
+    covered = _fut_oi.covered()
+    days = [d for d in sessions_between(start, end) if d.strftime("%Y-%m-%d") not in covered]
+
+    async def _fetch_all():
+        return await asyncio.gather(
+            *(http_client.apost(TAIFEX_FUT_URL, http_client.BACKGROUND, data=_fut_form(d)) for d in days),
+            return_exceptions=True,
+        )
+
+    for d, resp in zip(days, http_client.run(_fetch_all()) if days else []):
+        try:
+            if isinstance(resp, Exception):
+                raise resp
+            _store_fut_oi(d, resp)
+        except Exception as e:
+            print(f"futures {d} failed: {e}")
+    df = _fut_oi.read(start, end)
+    if df.empty:
+        return pd.DataFrame(columns=FUT_IDENTITIES)
+    df = df.pivot(index="date", columns="身份別", values="多空淨額未平倉口數")
+    return df.reindex(columns=FUT_IDENTITIES)
+
 def format_number(num_str):
     num_str = num_str.replace(",", "")
     num_float = float(num_str)
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+T86 三大法人買賣超歷史回補
+範例：python scripts/backfill_t86.py 2024-01-01 --rate 0.4
+可中斷後重跑，已存在的日期不會重抓
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stock_core.t86 import backfill
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回補 TWSE T86 三大法人買賣超")
+    parser.add_argument("start", help="起始日期 YYYY-MM-DD")
+    parser.add_argument("end", nargs="?", default=None, help="結束日期（預設最近交易日）")
+    parser.add_argument("--concurrency", type=int, default=3, help="同時進行的請求數")
+    parser.add_argument("--rate", type=float, default=None, help="TWSE 每秒請求數上限（預設依 rate_limiter）")
+    parser.add_argument("--retries", type=int, default=2, help="單日失敗重試次數")
+    args = parser.parse_args()
+
+    done, failed = backfill(
+        args.start, args.end, concurrency=args.concurrency, rate=args.rate, retries=args.retries
+    )
+    print(f"完成 {done} 天，失敗 {failed} 天")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+抓取與解析效能基準（離線）
+先連網錄製一次：python scripts/bench_fetchers.py --record
+之後離線重播：python scripts/bench_fetchers.py --latency 0.2 --jitter 0.05 --repeat 5
+每輪使用全新的資料目錄，量到的是冷啟動（含本地儲存寫入）的完整抓取路徑
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _fetchers():
+    import data
+    import stock_core as sc
+
+    fns = {
+        "fetch_00631L": sc.fetch_00631L,
+        "fetch_TWII": sc.fetch_TWII,
+        "fetch_TSM": sc.fetch_TSM,
+        "fetch_TAIFEX_metrics": sc.fetch_TAIFEX_metrics,
+        "fetch_market_breadth": sc.fetch_market_breadth,
+        "fetch_premium": sc.fetch_premium,
+        "fetch_foreign_spot": sc.fetch_foreign_spot,
+        "fetch_USDTWD": sc.fetch_USDTWD,
+    }
+    for name in ("fetch_data", "three_data", "turnover", "exchange_rate", "futures"):
+        fn = getattr(data, name)
+        # 略過 st.cache_data，每次都實際抓取
+        fns[f"data.{name}"] = getattr(fn, "__wrapped__", fn)
+    return fns
+
+
+def _timed(fn):
+    t = time.perf_counter()
+    try:
+        fn()
+        ok = True
+    except Exception as exc:
+        print(f"  {getattr(fn, '__name__', fn)}: {exc}")
+        ok = False
+    return time.perf_counter() - t, ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="離線抓取效能基準")
+    parser.add_argument("--record", action="store_true", help="連網錄製（只跑一輪）")
+    parser.add_argument("--cassette", default="cassettes", help="錄製目錄")
+    parser.add_argument("--latency", type=float, default=0.0, help="重播延遲（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="重播延遲抖動（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模擬連線失敗機率")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-limit", action="store_true", help="重播時關閉主機速率限制")
+    args = parser.parse_args()
+
+    from stock_core import rate_limiter, replay, store
+
+    mode = replay.RECORD if args.record else replay.REPLAY
+    replay.install(
+        mode, args.cassette, args.latency, args.jitter, args.error_rate, args.seed
+    )
+    if args.no_limit and not args.record:
+        for host in list(rate_limiter.HOST_LIMITS):
+            rate_limiter.configure(host, 1e9, 1000)
+
+    fns = _fetchers()
+    timings = {name: [] for name in fns}
+    failures = {name: 0 for name in fns}
+    stage = []
+    for _ in range(1 if args.record else args.repeat):
+        # 依序執行：各抓取函式自身的延遲
+        store.DATA_DIR = tempfile.mkdtemp(prefix="bench-")
+        for name, fn in fns.items():
+            dt, ok = _timed(fn)
+            timings[name].append(dt)
+            failures[name] += not ok
+        # 全部並行：與 daily_report 的抓取階段相同
+        store.DATA_DIR = tempfile.mkdtemp(prefix="bench-")
+        threads = [threading.Thread(target=_timed, args=(fn,)) for fn in fns.values()]
+        t = time.perf_counter()
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        stage.append(time.perf_counter() - t)
+
+    print(f"{'fetcher':<26}{'p50 ms':>10}{'max ms':>10}{'fail':>6}")
+    for name, ts in timings.items():
+        print(f"{name:<26}{statistics.median(ts) * 1e3:>10.1f}{max(ts) * 1e3:>10.1f}{failures[name]:>6}")
+    total = sum(statistics.median(ts) for ts in timings.values())
+    print(f"\n依序總和 {total * 1e3:.1f} ms｜並行 p50 {statistics.median(stage) * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,15 @@
 """
 
 import os
+import queue
 import sys
+import threading
+import time
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from stock_core import (
-    analyze_panic,
-    analyze_right,
+    analyze,
     fetch_00631L,
     fetch_TAIFEX_metrics,
     fetch_TWII,
@@ -22,6 +24,18 @@ from stock_core import (
     send_telegram,
 )
 
+# === 抓取階段時限（秒）===
+# 各資料源各自的逾時，加上整個抓取階段的總期限；逾時的資料源在報告中顯示 N/A
+FETCH_TIMEOUTS = {
+    "fetch_00631L": 20,
+    "fetch_TWII": 20,
+    "fetch_TAIFEX_metrics": 40,
+    "fetch_market_breadth": 30,
+    "fetch_premium": 20,
+    "fetch_foreign_spot": 30,
+}
+FETCH_DEADLINE = float(os.environ.get("FETCH_DEADLINE", "60"))
+
 
 def _safe_fetch(name, fetcher, default=None):
     try:
@@ -31,29 +45,74 @@ def _safe_fetch(name, fetcher, default=None):
         return default
 
 
+def _fetch_all(sources, timeouts=None, deadline=FETCH_DEADLINE):
+    """
+    同時執行所有資料源，回傳 {name: result}
+    每個資料源有各自的逾時，整體不超過 deadline 秒；
+    未在時限內完成或發生例外者回傳 None。
+    使用 daemon thread，逾時的請求不會拖住程式結束。
+    """
+    timeouts = timeouts or {}
+    done = queue.Queue()
+    start = time.monotonic()
+
+    def _run(name, fetcher):
+        done.put((name, _safe_fetch(name, fetcher)))
+
+    for name, fetcher in sources.items():
+        threading.Thread(target=_run, args=(name, fetcher), daemon=True).start()
+
+    results = {name: None for name in sources}
+    pending = {
+        name: start + min(timeouts.get(name, deadline), deadline) for name in sources
+    }
+    while pending:
+        now = time.monotonic()
+        for name in [n for n, t in pending.items() if t <= now]:
+            print(f"{name} timed out after {now - start:.1f}s")
+            del pending[name]
+        if not pending:
+            break
+        try:
+            name, value = done.get(timeout=min(pending.values()) - now)
+        except queue.Empty:
+            continue
+        if name in pending:
+            del pending[name]
+            results[name] = value
+    print(f"資料抓取完成，耗時 {time.monotonic() - start:.1f}s")
+    return results
+
+
 def main():
     print("00631L 每日報告生成中...")
 
-    # 取得資料
-    df_00631l = _safe_fetch("fetch_00631L", lambda: fetch_00631L("3mo"))
-    df_twii = _safe_fetch("fetch_TWII", lambda: fetch_TWII("3mo"))
-    taifex = _safe_fetch("fetch_TAIFEX_metrics", fetch_TAIFEX_metrics)
-    market = _safe_fetch("fetch_market_breadth", fetch_market_breadth)
-    premium = _safe_fetch("fetch_premium", fetch_premium)
-    foreign = _safe_fetch("fetch_foreign_spot", fetch_foreign_spot)
+    # 取得資料（並行）
+    data = _fetch_all(
+        {
+            "fetch_00631L": lambda: fetch_00631L("3mo"),
+            "fetch_TWII": lambda: fetch_TWII("3mo"),
+            "fetch_TAIFEX_metrics": fetch_TAIFEX_metrics,
+            "fetch_market_breadth": fetch_market_breadth,
+            "fetch_premium": fetch_premium,
+            "fetch_foreign_spot": fetch_foreign_spot,
+        },
+        timeouts=FETCH_TIMEOUTS,
+    )
+    df_00631l = data["fetch_00631L"]
+    df_twii = data["fetch_TWII"]
 
-    # 分析
-    analysis = analyze_right(df_00631l, df_twii)
-    panic = analyze_panic(df_00631l)
+    # 分析（右側與恐慌雷達共用指標計算）
+    analysis, panic = analyze(df_00631l, df_twii)
 
     # 生成報告
     report = generate_report(
         analysis=analysis,
         panic=panic,
-        taifex=taifex,
-        market=market,
-        premium=premium,
-        foreign=foreign,
+        taifex=data["fetch_TAIFEX_metrics"],
+        market=data["fetch_market_breadth"],
+        premium=data["fetch_premium"],
+        foreign=data["fetch_foreign_spot"],
     )
 
     # 發送
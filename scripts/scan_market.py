@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+全市場右側訊號 / 恐慌雷達掃描
+資料來自本地 OHLCV 儲存；--backfill 先把代碼表中的全部上市櫃代碼批次下載寫入
+範例：python scripts/scan_market.py --backfill --top 30
+      python scripts/scan_market.py 2330.TW 2317.TW --workers 2
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stock_core.data_fetcher import UNIVERSE_PERIOD, backfill_ohlcv
+from stock_core.scanner import scan
+
+
+def main():
+    parser = argparse.ArgumentParser(description="全市場右側訊號 / 恐慌雷達掃描")
+    parser.add_argument("symbols", nargs="*", help="ticker（預設為本地儲存中的全部）")
+    parser.add_argument("--workers", type=int, default=None, help="行程數（預設 CPU 核心數）")
+    parser.add_argument("--top", type=int, default=20, help="顯示前幾名")
+    parser.add_argument("--backfill", action="store_true", help="掃描前先回補 OHLCV（預設為全市場）")
+    parser.add_argument("--period", default=UNIVERSE_PERIOD, help="回補的期間（yfinance period）")
+    args = parser.parse_args()
+
+    if args.backfill:
+        saved, failed = backfill_ohlcv(args.symbols or None, period=args.period)
+        print(f"回補 {len(saved)} 檔，失敗 {len(failed)} 檔")
+    df, stats = scan(args.symbols or None, workers=args.workers)
+    print(df.head(args.top).to_string())
+    print(
+        f"\n掃描 {stats['scanned']}/{stats['symbols']} 檔，"
+        f"{stats['elapsed']:.2f}s，{stats['symbols_per_sec']:.1f} 檔/秒（{stats['workers']} 行程）"
+    )
+
+
+if __name__ == "__main__":
+    main()
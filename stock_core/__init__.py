@@ -22,11 +22,24 @@ from .indicators import (
     ATR,
     BB,
     ADX_DMI,
+    IndicatorContext,
+    analyze,
     analyze_right,
     analyze_panic,
+    right_signals,
+    panic_signals,
     safe_float,
 )
 
+from .strategies import (
+    Strategy,
+    MACross,
+    MACDCross,
+    ADXFilter,
+    RightSide,
+    PanicRebound,
+)
+
 from .reporter import (
     send_telegram,
     generate_report,
@@ -51,9 +64,20 @@ __all__ = [
     "ATR",
     "BB",
     "ADX_DMI",
+    "IndicatorContext",
+    "analyze",
     "analyze_right",
     "analyze_panic",
+    "right_signals",
+    "panic_signals",
     "safe_float",
+    # strategies
+    "Strategy",
+    "MACross",
+    "MACDCross",
+    "ADXFilter",
+    "RightSide",
+    "PanicRebound",
     # reporter
     "send_telegram",
     "generate_report",
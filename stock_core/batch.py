@@ -0,0 +1,152 @@
+"""
+stock_core/batch.py
+全市場批次指標：輸入為 (股票數 × 時間) 的 2-D NumPy 價格矩陣（float64 或 float32）
+每個指標對所有股票一次計算，NaN（停牌、新上市）的處理與 indicators.py 的單一 Series 版本相同：
+- 移動平均/標準差：視窗內有 NaN 即為 NaN
+- EMA：起始 NaN 保持 NaN；中途 NaN 延續前值，下一筆依 pandas（ignore_na=False）的權重衰減
+- 漲跌幅、DM：NaN 視為 0（與 Series.where 的行為相同）
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+_STD_CHUNK_ELEMS = 8_000_000  # 計算滾動標準差時每批展開的元素上限（控制記憶體）
+
+
+def _as_matrix(X):
+    X = np.asarray(X)
+    if X.dtype not in (np.float32, np.float64):
+        X = X.astype(np.float64)
+    return np.atleast_2d(X)
+
+
+def _pad(out, X, period):
+    """把長度 n-period+1 的視窗結果補回 n 欄（前 period-1 欄為 NaN）"""
+    full = np.full(X.shape, np.nan, dtype=X.dtype)
+    if out is not None:
+        full[:, period - 1:] = out
+    return full
+
+
+def rolling_mean(X, period):
+    X = _as_matrix(X)
+    if X.shape[1] < period:
+        return _pad(None, X, period)
+    return _pad(sliding_window_view(X, period, axis=1).mean(axis=-1), X, period)
+
+
+def rolling_std(X, period):
+    """樣本標準差（ddof=1）"""
+    X = _as_matrix(X)
+    if X.shape[1] < period or period < 2:
+        return _pad(None, X, period)
+    out = np.empty((X.shape[0], X.shape[1] - period + 1), dtype=X.dtype)
+    rows = max(1, _STD_CHUNK_ELEMS // (X.shape[1] * period))
+    for i in range(0, X.shape[0], rows):
+        win = sliding_window_view(X[i: i + rows], period, axis=1)
+        out[i: i + rows] = win.std(axis=-1, ddof=1)
+    return _pad(out, X, period)
+
+
+def EMA(X, period):
+    """span=period、adjust=False 的 EMA，逐時間點對所有股票向量化更新"""
+    X = _as_matrix(X)
+    alpha = X.dtype.type(2.0 / (period + 1))
+    decay = X.dtype.type(1.0) - alpha
+    out = np.empty_like(X)
+    weighted = X[:, 0].copy()
+    old_wt = np.ones(X.shape[0], dtype=X.dtype)
+    out[:, 0] = weighted
+    for t in range(1, X.shape[1]):
+        cur = X[:, t]
+        obs = ~np.isnan(cur)
+        started = ~np.isnan(weighted)
+        old_wt = np.where(started, old_wt * decay, old_wt)
+        upd = started & obs
+        with np.errstate(invalid="ignore"):
+            blended = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+        weighted = np.where(upd, blended, weighted)
+        old_wt = np.where(upd, 1.0, old_wt)
+        first = ~started & obs
+        weighted = np.where(first, cur, weighted)
+        out[:, t] = weighted
+    return out
+
+
+def MA(X, period):
+    return rolling_mean(X, period)
+
+
+def MACD(X, fast=12, slow=26, signal=9):
+    """回傳 (macd_line, signal_line, histogram)"""
+    macd_line = EMA(X, fast) - EMA(X, slow)
+    signal_line = EMA(macd_line, signal)
+    return macd_line, signal_line, macd_line - signal_line
+
+
+def _diff(X):
+    X = _as_matrix(X)
+    d = np.full_like(X, np.nan)
+    d[:, 1:] = X[:, 1:] - X[:, :-1]
+    return d
+
+
+def RSI(X, period=14):
+    delta = _diff(X)
+    with np.errstate(invalid="ignore"):
+        gain = np.where(delta > 0, delta, 0.0).astype(delta.dtype)
+        loss = np.where(delta < 0, -delta, 0.0).astype(delta.dtype)
+    avg_gain = rolling_mean(gain, period)
+    avg_loss = rolling_mean(loss, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_gain / avg_loss
+        return 100 - (100 / (1 + rs))
+
+
+def AO(H, L, fast=5, slow=34):
+    """Awesome Oscillator"""
+    med = (_as_matrix(H) + _as_matrix(L)) / 2
+    return rolling_mean(med, fast) - rolling_mean(med, slow)
+
+
+def TR(H, L, C):
+    """True Range；三項皆 NaN 才為 NaN（同 DataFrame.max(axis=1) 略過 NaN）"""
+    H, L, C = _as_matrix(H), _as_matrix(L), _as_matrix(C)
+    prev_c = np.full_like(C, np.nan)
+    prev_c[:, 1:] = C[:, :-1]
+    return np.fmax(np.fmax(H - L, np.abs(H - prev_c)), np.abs(L - prev_c))
+
+
+def ATR(H, L, C, period=14):
+    return rolling_mean(TR(H, L, C), period)
+
+
+def BB(X, period=20, std_dev=2):
+    m = rolling_mean(X, period)
+    s = rolling_std(X, period)
+    return m + std_dev * s, m, m - std_dev * s
+
+
+def ADX_DMI(H, L, C, period=14):
+    """計算 ADX, +DI, -DI"""
+    up_move = _diff(H)
+    down_move = -_diff(L)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0).astype(up_move.dtype)
+        minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0.0).astype(up_move.dtype)
+        atr_s = ATR(H, L, C, period)
+        plus_di = (rolling_mean(plus_dm, period) / atr_s) * 100
+        minus_di = (rolling_mean(minus_dm, period) / atr_s) * 100
+        dx = (np.abs(plus_di - minus_di) / (plus_di + minus_di)) * 100
+    return rolling_mean(dx, period), plus_di, minus_di
+
+
+def panel(frames, column="Close", dtype=np.float64):
+    """
+    {代號: OHLCV DataFrame} → (代號 list, 日期 index, 股票 × 日期 矩陣)
+    日期取聯集，缺少的日期為 NaN
+    """
+    symbols = list(frames)
+    wide = pd.concat({s: frames[s][column] for s in symbols}, axis=1)
+    return symbols, wide.index, wide.to_numpy(dtype=dtype).T.copy()
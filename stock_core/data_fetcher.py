@@ -4,10 +4,16 @@ stock_core/data_fetcher.py
 """
 
 import os
-from datetime import date, datetime, timedelta
+from datetime import date, datetime, time, timedelta
 import re
+import threading
 import warnings
 
+import numpy as np
+import pandas as pd
+
+from . import http_client, replay, store, symbols, trading_calendar
+
 try:
     from dotenv import load_dotenv
 
@@ -21,50 +27,280 @@ warnings.filterwarnings("ignore")
 FINMIND_TOKEN = os.environ.get("FINMIND_TOKEN", "")
 
 
-def _finmind_loader():
-    from FinMind.data import DataLoader
+TAIFEX_LOOKBACK_DAYS = 14  # 期貨/融資指標只需要最近一兩個交易日
+BREADTH_READY = time(14, 30)  # MI_INDEX 盤後資料公布時間
 
-    dl = DataLoader()
-    if FINMIND_TOKEN:
-        try:
-            dl.login_by_token(api_token=FINMIND_TOKEN)
-        except Exception:
-            pass
-    return dl
+_finmind_dl = None
+_finmind_lock = threading.Lock()
 
 
-def fetch_00631L(period="3mo"):
-    """取得 00631L 歷史報價（Yahoo Finance）"""
+def _finmind_loader():
+    """全程序共用一個已登入的 DataLoader"""
+    global _finmind_dl
+    with _finmind_lock:
+        if _finmind_dl is None:
+            from FinMind.data import DataLoader
+
+            dl = DataLoader()
+            if FINMIND_TOKEN:
+                try:
+                    dl.login_by_token(api_token=FINMIND_TOKEN)
+                except Exception:
+                    pass
+            _finmind_dl = dl
+        return _finmind_dl
+
+
+def _finmind_cached(method, start, end, key=None, **kwargs):
+    """
+    以日期分區快取 FinMind 資料集，只向 API 要尚未儲存的日期
+    key 用來區分同一 method 的不同參數（例如 futures_id）
+    """
+    name = method if key is None else f"{method}/{key}"
+    cache = store.DatePartitionedStore(name)
+    missing = cache.missing(start, end)
+    if missing:
+        df = replay.call(
+            f"finmind.{method}",
+            getattr(_finmind_loader(), method),
+            start_date=missing[0],
+            end_date=missing[-1],
+            **kwargs,
+        )
+        cache.write(df, missing[0], missing[-1])
+    return cache.read(start, end)
+
+
+# === Yahoo 歷史報價：本地 Parquet + 只補抓缺少的尾段 ===
+OHLCV_REFRESH_SECONDS = 600  # 距上次更新不到此秒數，直接讀本地不連網
+
+_PERIOD_UNITS = {"d": "days", "wk": "weeks", "mo": "months", "y": "years"}
+
+
+def _period_start(period, now=None):
+    """把 yfinance 的 period 字串轉為起始日期（max 回傳 None）"""
+    now = pd.Timestamp(now or date.today()).normalize()
+    if period == "max":
+        return None
+    if period == "ytd":
+        return pd.Timestamp(now.year, 1, 1)
+    m = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if not m:
+        raise ValueError(f"不支援的 period: {period}")
+    return now - pd.DateOffset(**{_PERIOD_UNITS[m.group(2)]: int(m.group(1))})
+
+
+def _is_readjusted(stored, new):
+    """新資料含除權息/分割，或重疊日收盤價不同 → 歷史價格已被還原調整"""
+    for col in ("Dividends", "Stock Splits"):
+        if col in new.columns and (new[col].fillna(0) != 0).any():
+            return True
+    common = stored.index[:-1].intersection(new.index)
+    if common.empty:
+        return False
+    a = stored.loc[common, "Close"].to_numpy(dtype=float)
+    b = new.loc[common, "Close"].to_numpy(dtype=float)
+    return not np.allclose(a, b, rtol=1e-6, equal_nan=True)
+
+
+def _fetch_history(ticker, period="3mo"):
+    """
+    取得 ticker 歷史報價（欄位與 yf.Ticker.history 相同）
+    本地已有涵蓋 period 的資料時只下載最後幾根 K 棒並附加；
+    偵測到除權息還原時整段重抓，period="max" 一律整段下載。
+    """
     import yfinance as yf
 
-    df = yf.Ticker("00631L.TW").history(period=period)
+    start = _period_start(period)
+    stored = store.load_ohlcv(ticker)
+    have = stored is not None and len(stored) >= 2
+    covers = (
+        have
+        and start is not None
+        and stored.index[0].tz_localize(None).normalize() <= start + pd.Timedelta(days=7)
+    )
+    age = store.ohlcv_age(ticker)
+
+    if covers and age is not None and age < OHLCV_REFRESH_SECONDS:
+        df = stored
+    elif covers:
+        # 從倒數第二根開始抓：一根已收盤的重疊 K 棒用來檢查還原，最後一根可能是盤中資料
+        tk = yf.Ticker(ticker)
+        new = replay.call(
+            f"yf.history:{ticker}", tk.history, start=stored.index[-2].strftime("%Y-%m-%d")
+        )
+        if new.empty:
+            df = stored
+        elif _is_readjusted(stored, new):
+            df = replay.call(
+                f"yf.history:{ticker}", tk.history, start=stored.index[0].strftime("%Y-%m-%d")
+            )
+        else:
+            df = store.merge_ohlcv(stored, new)
+        if not df.empty:
+            store.save_ohlcv(ticker, df)
+    else:
+        df = replay.call(f"yf.history:{ticker}", yf.Ticker(ticker).history, period=period)
+        if not df.empty:
+            store.save_ohlcv(ticker, df)
+
+    if df.empty:
+        return None
+    if period.endswith("d") and period[:-1].isdigit():
+        df = df.tail(int(period[:-1]))
+    elif start is not None:
+        df = df[df.index.tz_localize(None) >= start]
     return df if not df.empty else None
 
 
-def fetch_TWII(period="3mo"):
-    """取得加權指數（Yahoo Finance）"""
+def _covers_range(ticker, stored, start, end):
+    """
+    本地資料是否已涵蓋 [start, end)：起點在 7 天內，且區間內最後一個已收盤的交易日已入庫
+    最後一根是今天的 K 棒（可能是盤中資料）或交易日曆無法判斷時，需在 OHLCV_REFRESH_SECONDS 內更新過
+    """
+    if stored is None or len(stored) < 2:
+        return False
+    index = stored.index.tz_localize(None).normalize()
+    if index[0] > start + pd.Timedelta(days=7):
+        return False
+    age = store.ohlcv_age(ticker)
+    fresh = age is not None and age < OHLCV_REFRESH_SECONDS
+    try:
+        last = min((end - pd.Timedelta(days=1)).date(), trading_calendar.latest_trading_day())
+        needed = trading_calendar.previous_sessions(1, last)[-1]
+    except ValueError:
+        return fresh
+    if index[-1].date() < needed:
+        return False
+    return index[-1].date() < date.today() or fresh
+
+
+def load_ohlcv_range(ticker, start, end):
+    """
+    [start, end) 的日 K（欄位與 yf.Ticker.history 相同）
+    本地儲存已涵蓋時直接讀檔不連網；否則下載該區間，沒有還原調整時與既有資料合併寫回
+    """
     import yfinance as yf
 
-    df = yf.Ticker("^TWII").history(period=period)
+    start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+    stored = store.load_ohlcv(ticker)
+    if not _covers_range(ticker, stored, start, end):
+        new = replay.call(
+            f"yf.history:{ticker}",
+            yf.Ticker(ticker).history,
+            start=start.strftime("%Y-%m-%d"),
+            end=end.strftime("%Y-%m-%d"),
+        )
+        if new.empty:
+            return None
+        if stored is not None and len(stored) >= 2 and not _is_readjusted(stored, new):
+            new = store.merge_ohlcv(stored, new)
+        store.save_ohlcv(ticker, new)
+        stored = new
+    index = stored.index.tz_localize(None)
+    df = stored[(index >= start) & (index < end)]
     return df if not df.empty else None
 
 
-def fetch_TSM(period="3mo"):
-    """取得台積電 ADR"""
+# === 全市場 OHLCV 回補（scanner 的資料來源）===
+UNIVERSE_PERIOD = "1y"  # analyze_right / analyze_panic 只需最近數十根 K 棒
+UNIVERSE_BATCH_SIZE = 50  # 每次 yf.download 的代碼數
+
+
+def _split_download(data, tickers):
+    """yf.download(group_by="ticker") 的結果拆成 {ticker: OHLCV}，略過沒有資料的代碼"""
+    frames = {}
+    if data is None or data.empty:
+        return frames
+    for ticker in tickers:
+        if isinstance(data.columns, pd.MultiIndex):
+            if ticker not in data.columns.get_level_values(0):
+                continue
+            df = data[ticker]
+        else:
+            df = data
+        df = df.dropna(how="all")
+        if df.empty:
+            continue
+        if df.index.tz is None:
+            # 與 yf.Ticker.history 一致（交易所時區），才能和既有檔案合併
+            df = df.tz_localize("Asia/Taipei")
+        frames[ticker] = df
+    return frames
+
+
+def backfill_ohlcv(tickers=None, period=UNIVERSE_PERIOD, batch_size=UNIVERSE_BATCH_SIZE, threads=4, log=print):
+    """
+    批次下載 tickers（預設為代碼表中所有上市櫃代碼）的日 K 寫入本地 OHLCV 儲存
+    距上次更新不到 OHLCV_REFRESH_SECONDS 的略過；既有檔案沒有還原調整時合併，否則整段取代
+    回傳 (已寫入的 ticker, 失敗的 ticker)
+    """
     import yfinance as yf
 
-    df = yf.Ticker("TSM").history(period=period)
-    return df if not df.empty else None
+    if tickers is None:
+        tickers = symbols.resolve_many(symbols.master().index)
+    todo = []
+    for ticker in tickers:
+        age = store.ohlcv_age(ticker)
+        if age is None or age >= OHLCV_REFRESH_SECONDS:
+            todo.append(ticker)
+
+    saved, failed = [], []
+    for i in range(0, len(todo), batch_size):
+        batch = todo[i : i + batch_size]
+        try:
+            data = replay.call(
+                f"yf.download:{batch[0]}",
+                yf.download,
+                batch,
+                period=period,
+                group_by="ticker",
+                auto_adjust=True,
+                threads=threads,
+                progress=False,
+            )
+        except Exception as e:
+            log(f"OHLCV backfill batch {batch[0]}.. failed: {e}")
+            failed += batch
+            continue
+        frames = _split_download(data, batch)
+        for ticker in batch:
+            new = frames.get(ticker)
+            if new is None:
+                failed.append(ticker)
+                continue
+            stored = store.load_ohlcv(ticker)
+            if stored is not None and len(stored) >= 2 and not _is_readjusted(stored, new):
+                new = store.merge_ohlcv(stored, new)
+            store.save_ohlcv(ticker, new)
+            saved.append(ticker)
+        log(f"OHLCV backfill {min(i + batch_size, len(todo))}/{len(todo)}")
+    return saved, failed
+
+
+def fetch_00631L(period="3mo"):
+    """取得 00631L 歷史報價（Yahoo Finance）"""
+    return _fetch_history("00631L.TW", period)
+
+
+def fetch_TWII(period="3mo"):
+    """取得加權指數（Yahoo Finance）"""
+    return _fetch_history("^TWII", period)
+
+
+def fetch_TSM(period="3mo"):
+    """取得台積電 ADR"""
+    return _fetch_history("TSM", period)
 
 
 def fetch_TAIFEX_metrics():
     """取得期貨三大法人 + 融資融券數據（FinMind）"""
-    dl = _finmind_loader()
     today = date.today().strftime("%Y-%m-%d")
+    start = (date.today() - timedelta(days=TAIFEX_LOOKBACK_DAYS)).strftime("%Y-%m-%d")
 
     # 外資大台淨 OI
-    df_tx = dl.taiwan_futures_institutional_investors(
-        futures_id="TX", start_date="2026-01-01", end_date=today
+    df_tx = _finmind_cached(
+        "taiwan_futures_institutional_investors", start, today, key="TX", futures_id="TX"
     )
     latest_tx = df_tx["date"].max()
     df_tx_f = df_tx[
@@ -77,15 +313,15 @@ def fetch_TAIFEX_metrics():
     )
 
     # 散戶小台多空比（MTX）
-    df_mtx = dl.taiwan_futures_daily(
-        futures_id="MTX", start_date="2026-01-01", end_date=today
+    df_mtx = _finmind_cached(
+        "taiwan_futures_daily", start, today, key="MTX", futures_id="MTX"
     )
     df_mtx_p = df_mtx[df_mtx["trading_session"] == "position"]
     latest_mtx = df_mtx_p["date"].max()
     df_mtx_l = df_mtx_p[df_mtx_p["date"] == latest_mtx]
     total_oi = int(df_mtx_l["open_interest"].sum())
-    df_mtx_i = dl.taiwan_futures_institutional_investors(
-        futures_id="MTX", start_date="2026-01-01", end_date=today
+    df_mtx_i = _finmind_cached(
+        "taiwan_futures_institutional_investors", start, today, key="MTX", futures_id="MTX"
     )
     df_mtx_i = df_mtx_i[df_mtx_i["date"] == latest_mtx]
     inst_l = int(df_mtx_i["long_open_interest_balance_volume"].sum())
@@ -95,9 +331,7 @@ def fetch_TAIFEX_metrics():
     mtx_ratio = round((r_long - r_short) / total_oi * 100, 2) if total_oi > 0 else 0
 
     # 融資餘額增減
-    df_marg = dl.taiwan_stock_margin_purchase_short_sale_total(
-        start_date="2026-01-01", end_date=today
-    )
+    df_marg = _finmind_cached("taiwan_stock_margin_purchase_short_sale_total", start, today)
     df_mp = df_marg[df_marg["name"] == "MarginPurchase"].sort_values("date")
     lat = df_mp.iloc[-1]
     prv = df_mp.iloc[-2]
@@ -116,19 +350,13 @@ def fetch_TAIFEX_metrics():
 
 def fetch_market_breadth():
     """取得台股 ADL 騰落指標（TWSE）"""
-    from urllib.request import Request, urlopen
-    import ssl
-    import json
-
-    ctx = ssl.create_default_context()
-    ctx.check_hostname = False
-    ctx.verify_mode = ssl.CERT_NONE
-    for days_back in range(7):
-        d = (datetime.now() - timedelta(days=days_back)).strftime("%Y%m%d")
+    # 直接查最近交易日；當天資料若尚未公布（或臨時休市）再退一個交易日
+    # 超出休市日資料範圍時 probe_sessions 會多給幾天，逐日往前探測
+    latest = trading_calendar.latest_trading_day(ready=BREADTH_READY)
+    for session in reversed(trading_calendar.probe_sessions(2, latest)):
+        d = session.strftime("%Y%m%d")
         url = f"https://www.twse.com.tw/rwd/zh/afterTrading/MI_INDEX?date={d}&response=json"
-        req = Request(url, headers={"User-Agent": "Mozilla/5.0"})
-        raw = urlopen(req, timeout=10, context=ctx).read()
-        data = json.loads(raw.decode("utf-8"))
+        data = http_client.get(url, timeout=10).json()
         for t in data.get("tables", []):
             if "漲跌證券數合計" in t.get("title", ""):
                 up = down = same = 0
@@ -156,12 +384,12 @@ def fetch_premium():
     import yfinance as yf
 
     t = yf.Ticker("00631L.TW")
-    df = t.history(period="5d")
+    df = replay.call("yf.history:00631L.TW", t.history, period="5d")
     if df is None or df.empty:
         return None
     price = float(df["Close"].iloc[-1])
     try:
-        nav = t.info.get("navPrice", None)
+        nav = replay.call("yf.info:00631L.TW", lambda: t.info).get("navPrice", None)
         nav = float(nav) if (nav and nav > 0) else None
     except Exception:
         nav = None
@@ -175,8 +403,11 @@ def fetch_foreign_spot():
     """取得外資現貨買賣超（FinMind）"""
     dl = _finmind_loader()
     today = date.today().strftime("%Y-%m-%d")
-    df = dl.taiwan_stock_institutional_investors_total(
-        start_date=today, end_date=today
+    df = replay.call(
+        "finmind.taiwan_stock_institutional_investors_total",
+        dl.taiwan_stock_institutional_investors_total,
+        start_date=today,
+        end_date=today,
     )
     fi = df[df["name"] == "Foreign_Investor"]
     if fi.empty:
@@ -195,7 +426,9 @@ def fetch_USDTWD():
     try:
         dl = _finmind_loader()
         today = date.today().strftime("%Y-%m-%d")
-        df = dl.taiwan_ExchangeRate(start_date=today, end_date=today)
+        df = replay.call(
+            "finmind.taiwan_ExchangeRate", dl.taiwan_ExchangeRate, start_date=today, end_date=today
+        )
         if df is None or df.empty:
             return None
         row = df.iloc[-1]
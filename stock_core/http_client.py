@@ -0,0 +1,124 @@
+"""
+stock_core/http_client.py
+共用 HTTP 連線池（httpx），同步與非同步入口共用 keep-alive 連線
+非同步請求在單一背景 event loop 上執行，不再每次 asyncio.run 建新的 loop 與 client
+所有請求先經過 rate_limiter 的主機速率限制
+"""
+
+import asyncio
+import os
+import ssl
+import threading
+
+import certifi
+import httpx
+
+from . import rate_limiter, replay
+from .rate_limiter import BACKGROUND, INTERACTIVE
+
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+TIMEOUT = httpx.Timeout(15.0, connect=10.0)
+LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60)
+
+
+def _ssl_context():
+    """驗證憑證，但不啟用 Python 3.13 的 X509 嚴格模式（TWSE 憑證缺 Subject Key Identifier 會被拒）"""
+    if os.environ.get("STOCK_HTTP_VERIFY", "1") == "0":
+        return False
+    ctx = ssl.create_default_context(cafile=certifi.where())
+    ctx.verify_flags &= ~getattr(ssl, "VERIFY_X509_STRICT", 0)
+    return ctx
+
+
+VERIFY = _ssl_context()
+
+_lock = threading.Lock()
+_client = None
+_async_client = None
+_loop = None
+
+
+def client():
+    """程序共用的同步 httpx.Client"""
+    global _client
+    with _lock:
+        if _client is None:
+            _client = httpx.Client(
+                headers=HEADERS, timeout=TIMEOUT, limits=LIMITS, verify=VERIFY,
+                follow_redirects=True, transport=replay.transport(verify=VERIFY, limits=LIMITS),
+            )
+        return _client
+
+
+def _background_loop():
+    """啟動（或取得）背景 event loop，所有非同步請求都跑在這裡"""
+    global _loop
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="http-loop", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+def async_client():
+    """背景 loop 上共用的 httpx.AsyncClient（只能在 run() 執行的協程中使用）"""
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(
+            headers=HEADERS, timeout=TIMEOUT, limits=LIMITS, verify=VERIFY,
+            follow_redirects=True, transport=replay.async_transport(verify=VERIFY, limits=LIMITS),
+        )
+    return _async_client
+
+
+def reset():
+    """關閉共用 client，下次使用時依目前設定（例如 replay 模式）重建"""
+    global _client, _async_client
+    with _lock:
+        old, _client = _client, None
+        old_async, _async_client = _async_client, None
+    if old is not None:
+        old.close()
+    if old_async is not None and _loop is not None:
+        run(old_async.aclose())
+
+
+def get(url, priority=INTERACTIVE, **kwargs):
+    """同步 GET"""
+    rate_limiter.acquire(url, priority)
+    return client().get(url, **kwargs)
+
+
+async def aget(url, priority=INTERACTIVE, **kwargs):
+    """非同步 GET（在背景 loop 上）"""
+    await rate_limiter.acquire_async(url, priority)
+    return await async_client().get(url, **kwargs)
+
+
+def post(url, priority=INTERACTIVE, **kwargs):
+    """同步 POST"""
+    rate_limiter.acquire(url, priority)
+    return client().post(url, **kwargs)
+
+
+async def apost(url, priority=INTERACTIVE, **kwargs):
+    """非同步 POST（在背景 loop 上）"""
+    await rate_limiter.acquire_async(url, priority)
+    return await async_client().post(url, **kwargs)
+
+
+def run(coro, timeout=None):
+    """在背景 loop 上執行協程並等待結果（可從任何執行緒呼叫）"""
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result(timeout)
+
+
+def get_many(urls, priority=INTERACTIVE, **kwargs):
+    """同時 GET 多個網址，依輸入順序回傳 Response 或 Exception"""
+
+    async def _all():
+        return await asyncio.gather(
+            *(aget(u, priority, **kwargs) for u in urls), return_exceptions=True
+        )
+
+    return run(_all())
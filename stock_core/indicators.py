@@ -3,6 +3,10 @@ stock_core/indicators.py
 技術指標計算模組（純函數，無 API 依賴）
 """
 
+import functools
+import inspect
+import math
+
 import pandas as pd
 import numpy as np
 
@@ -18,100 +22,278 @@ def safe_float(val):
         return None
 
 
+def _memoized(fn):
+    """以 (方法名稱, 參數) 為鍵快取 IndicatorContext 的計算結果（預設參數會先補齊）"""
+    sig = inspect.signature(fn)
+
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        bound = sig.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        key = (fn.__name__,) + tuple(bound.arguments.values())[1:]
+        try:
+            return self._cache[key]
+        except KeyError:
+            value = self._cache[key] = fn(self, *args, **kwargs)
+            return value
+
+    return wrapper
+
+
+class IndicatorContext:
+    """
+    單一 OHLCV 資料上的指標計算環境
+    中間結果（TR、DM、漲跌幅、移動平均、EMA…）依名稱與參數快取，
+    同一份資料上的多個指標/分析共用，不重複計算
+    衍生序列以鍵 tuple 表示，例如 ("tr",)、("gain", "Close")，可直接傳給 mean()/ema()
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._cache = {}
+
+    @classmethod
+    def from_series(cls, close=None, high=None, low=None, volume=None):
+        cols = {"Close": close, "High": high, "Low": low, "Volume": volume}
+        return cls({k: v for k, v in cols.items() if v is not None})
+
+    def series(self, src):
+        """欄位名稱 → 原始欄位；鍵 tuple → 對應的衍生序列"""
+        if isinstance(src, str):
+            return self.df[src]
+        return getattr(self, src[0])(*src[1:])
+
+    # === 基本運算 ===
+
+    @_memoized
+    def mean(self, src, period):
+        return self.series(src).rolling(period).mean()
+
+    @_memoized
+    def std(self, src, period):
+        return self.series(src).rolling(period).std()
+
+    @_memoized
+    def ema(self, src, period):
+        return self.series(src).ewm(span=period, adjust=False).mean()
+
+    @_memoized
+    def delta(self, col="Close"):
+        return self.series(col).diff()
+
+    @_memoized
+    def gain(self, col="Close"):
+        d = self.delta(col)
+        return d.where(d > 0, 0.0)
+
+    @_memoized
+    def loss(self, col="Close"):
+        d = self.delta(col)
+        return (-d).where(d < 0, 0.0)
+
+    @_memoized
+    def median(self):
+        return (self.df["High"] + self.df["Low"]) / 2
+
+    @_memoized
+    def tr(self):
+        h, l, c = self.df["High"], self.df["Low"], self.df["Close"]
+        prev_c = c.shift(1)
+        tr1 = h - l
+        tr2 = abs(h - prev_c)
+        tr3 = abs(l - prev_c)
+        return pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
+
+    @_memoized
+    def plus_dm(self):
+        up_move, down_move = self._moves()
+        return up_move.where((up_move > down_move) & (up_move > 0), 0.0)
+
+    @_memoized
+    def minus_dm(self):
+        up_move, down_move = self._moves()
+        return down_move.where((down_move > up_move) & (down_move > 0), 0.0)
+
+    @_memoized
+    def _moves(self):
+        h, l = self.df["High"], self.df["Low"]
+        return h - h.shift(1), l.shift(1) - l
+
+    # === 指標 ===
+
+    def ma(self, period, col="Close"):
+        return self.mean(col, period)
+
+    @_memoized
+    def macd_line(self, fast=12, slow=26, col="Close"):
+        return self.ema(col, fast) - self.ema(col, slow)
+
+    @_memoized
+    def macd(self, fast=12, slow=26, signal=9, col="Close"):
+        macd_line = self.macd_line(fast, slow, col)
+        signal_line = self.ema(("macd_line", fast, slow, col), signal)
+        histogram = macd_line - signal_line
+        return macd_line, signal_line, histogram
+
+    @_memoized
+    def rsi(self, period=14, col="Close"):
+        avg_gain = self.mean(("gain", col), period)
+        avg_loss = self.mean(("loss", col), period)
+        rs = avg_gain / avg_loss
+        return 100 - (100 / (1 + rs))
+
+    @_memoized
+    def ao(self, fast=5, slow=34):
+        return self.mean(("median",), fast) - self.mean(("median",), slow)
+
+    def atr(self, period=14):
+        return self.mean(("tr",), period)
+
+    @_memoized
+    def bb(self, period=20, std_dev=2, col="Close"):
+        m = self.mean(col, period)
+        s_std = self.std(col, period)
+        return m + std_dev * s_std, m, m - std_dev * s_std
+
+    @_memoized
+    def di(self, period=14):
+        atr_s = self.atr(period)
+        plus_di = (self.mean(("plus_dm",), period) / atr_s) * 100
+        minus_di = (self.mean(("minus_dm",), period) / atr_s) * 100
+        return plus_di, minus_di
+
+    @_memoized
+    def dx(self, period=14):
+        plus_di, minus_di = self.di(period)
+        return (abs(plus_di - minus_di) / (plus_di + minus_di)) * 100
+
+    @_memoized
+    def adx_dmi(self, period=14):
+        plus_di, minus_di = self.di(period)
+        return self.mean(("dx", period), period), plus_di, minus_di
+
+
 def MA(s, period):
-    return s.rolling(period).mean()
+    return IndicatorContext.from_series(close=s).ma(period)
 
 
 def EMA(s, period):
-    return s.ewm(span=period, adjust=False).mean()
+    return IndicatorContext.from_series(close=s).ema("Close", period)
 
 
 def MACD(s, fast=12, slow=26, signal=9):
     """回傳 (macd_line, signal_line, histogram)"""
-    ema_fast = EMA(s, fast)
-    ema_slow = EMA(s, slow)
-    macd_line = ema_fast - ema_slow
-    signal_line = EMA(macd_line, signal)
-    histogram = macd_line - signal_line
-    return macd_line, signal_line, histogram
+    return IndicatorContext.from_series(close=s).macd(fast, slow, signal)
 
 
 def RSI(s, period=14):
-    delta = s.diff()
-    gain = delta.where(delta > 0, 0.0)
-    loss = (-delta).where(delta < 0, 0.0)
-    avg_gain = gain.rolling(period).mean()
-    avg_loss = loss.rolling(period).mean()
-    rs = avg_gain / avg_loss
-    return 100 - (100 / (1 + rs))
+    return IndicatorContext.from_series(close=s).rsi(period)
 
 
 def AO(h, l, fast=5, slow=34):
     """Awesome Oscillator"""
-    med = (h + l) / 2
-    return MA(med, fast) - MA(med, slow)
+    return IndicatorContext.from_series(high=h, low=l).ao(fast, slow)
 
 
 def ATR(h, l, c, period=14):
-    tr1 = h - l
-    tr2 = abs(h - c.shift(1))
-    tr3 = abs(l - c.shift(1))
-    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-    return tr.rolling(period).mean()
+    return IndicatorContext.from_series(close=c, high=h, low=l).atr(period)
 
 
 def BB(s, period=20, std_dev=2):
-    m = MA(s, period)
-    s_std = s.rolling(period).std()
-    upper = m + std_dev * s_std
-    lower = m - std_dev * s_std
-    return upper, m, lower
+    return IndicatorContext.from_series(close=s).bb(period, std_dev)
 
 
 def ADX_DMI(h, l, c, period=14):
     """計算 ADX, +DI, -DI"""
-    tr1 = h - l
-    tr2 = abs(h - c.shift(1))
-    tr3 = abs(l - c.shift(1))
-    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-    up_move = h - h.shift(1)
-    down_move = l.shift(1) - l
-    plus_dm = up_move.where((up_move > down_move) & (up_move > 0), 0.0)
-    minus_dm = down_move.where((down_move > up_move) & (down_move > 0), 0.0)
-    atr_s = tr.rolling(period).mean()
-    plus_di = (plus_dm.rolling(period).mean() / atr_s) * 100
-    minus_di = (minus_dm.rolling(period).mean() / atr_s) * 100
-    dx = (abs(plus_di - minus_di) / (plus_di + minus_di)) * 100
-    adx_val = dx.rolling(period).mean()
-    return adx_val, plus_di, minus_di
-
-
-def analyze_right(df, df_twii=None):
+    return IndicatorContext.from_series(close=c, high=h, low=l).adx_dmi(period)
+
+
+# === 尾段計算（tail mode）===
+# 分析只讀最後一兩根的指標值，長歷史時只需切出最少的尾段再計算
+# 滾動類指標的尾段結果與全段相同；EMA 類加上收斂暖機，使初值權重低於 tol
+
+TAIL_TOLERANCE = 1e-6
+RIGHT_MIN_BARS = 50  # analyze_right 至少需要的 K 棒數
+PANIC_MIN_BARS = 25  # analyze_panic 至少需要的 K 棒數
+
+
+def ema_warmup(period, tol=TAIL_TOLERANCE):
+    """EMA（adjust=False）初值權重衰減到 tol 以下所需的 K 棒數"""
+    decay = 1 - 2 / (period + 1)
+    return int(math.ceil(math.log(tol) / math.log(decay)))
+
+
+# 指標名稱 → 計算最後一個值所需的 K 棒數（tol, *指標參數）
+LOOKBACK = {
+    "MA": lambda tol, period: period,
+    "EMA": lambda tol, period: ema_warmup(period, tol),
+    "MACD": lambda tol, fast=12, slow=26, signal=9: (
+        ema_warmup(max(fast, slow), tol) + ema_warmup(signal, tol)
+    ),
+    "RSI": lambda tol, period=14: period + 1,
+    "AO": lambda tol, fast=5, slow=34: max(fast, slow),
+    "ATR": lambda tol, period=14: period + 1,
+    "BB": lambda tol, period=20, std_dev=2: period,
+    "ADX_DMI": lambda tol, period=14: 2 * period + 1,
+}
+
+
+def right_lookback(tol=TAIL_TOLERANCE):
+    """analyze_right 需要的尾段長度（含讀取前一根的 +1，且不少於 RIGHT_MIN_BARS）"""
+    return max(RIGHT_MIN_BARS, 1 + max(
+        LOOKBACK["MA"](tol, 50),
+        LOOKBACK["MACD"](tol),
+        LOOKBACK["RSI"](tol, 14),
+        LOOKBACK["AO"](tol),
+        LOOKBACK["ATR"](tol, 14),
+        LOOKBACK["ADX_DMI"](tol, 14),
+    ))
+
+
+def panic_lookback(tol=TAIL_TOLERANCE):
+    """analyze_panic 需要的尾段長度（不少於 PANIC_MIN_BARS）"""
+    return max(PANIC_MIN_BARS, 1 + max(
+        LOOKBACK["MA"](tol, 20),
+        LOOKBACK["RSI"](tol, 14),
+        LOOKBACK["BB"](tol, 20),
+    ))
+
+
+def _tail(df, n):
+    return df.iloc[-n:] if df is not None and len(df) > n else df
+
+
+def analyze_right(df, df_twii=None, ctx=None, tail=False, tol=TAIL_TOLERANCE):
     """
     右側順勢交易分析
     回傳完整分析結果 dict
+    ctx 可傳入同一份 df 的 IndicatorContext，與其他分析共用中間結果
+    tail=True（且未傳 ctx）時只取計算所需的尾段，EMA 類結果與全段差距在 tol 等級內
     """
-    if df is None or len(df) < 50:
+    if tail and ctx is None:
+        df = _tail(df, right_lookback(tol))
+    if df is None or len(df) < RIGHT_MIN_BARS:
         return None
-    c, h, l = df["Close"], df["High"], df["Low"]
+    ctx = ctx or IndicatorContext(df)
+    c = df["Close"]
     price = c.iloc[-1]
     prev = c.iloc[-2]
-    ma20 = MA(c, 20).iloc[-1]
-    ma50 = MA(c, 50).iloc[-1]
-    ma5 = MA(c, 5).iloc[-1]
-    mc, sc, hc = MACD(c)
+    ma20 = ctx.ma(20).iloc[-1]
+    ma50 = ctx.ma(50).iloc[-1]
+    ma5 = ctx.ma(5).iloc[-1]
+    mc, sc, hc = ctx.macd()
     mc_p = mc.iloc[-2]
     sc_p = sc.iloc[-2]
-    r14 = RSI(c, 14).iloc[-1]
-    r5 = RSI(c, 5).iloc[-1]
-    aoc = AO(h, l).iloc[-1]
-    atr_val = ATR(h, l, c, 14).iloc[-1]
-    adx_val, plus_di, minus_di = ADX_DMI(h, l, c, 14)
+    r14 = ctx.rsi(14).iloc[-1]
+    r5 = ctx.rsi(5).iloc[-1]
+    aoc = ctx.ao().iloc[-1]
+    atr_val = ctx.atr(14).iloc[-1]
+    adx_val, plus_di, minus_di = ctx.adx_dmi(14)
     adx = adx_val.iloc[-1] if not adx_val.isna().iloc[-1] else 0
     pdi = plus_di.iloc[-1] if not plus_di.isna().iloc[-1] else 0
     mdi = minus_di.iloc[-1] if not minus_di.isna().iloc[-1] else 0
     vol = df["Volume"]
-    vol_ma5 = vol.rolling(5).mean().iloc[-1]
+    vol_ma5 = ctx.mean("Volume", 5).iloc[-1]
     vol_ratio = vol.iloc[-1] / vol_ma5 if vol_ma5 and vol_ma5 > 0 else 0
 
     # 進場條件
@@ -186,21 +368,24 @@ def analyze_right(df, df_twii=None):
     }
 
 
-def analyze_panic(df):
+def analyze_panic(df, ctx=None, tail=False, tol=TAIL_TOLERANCE):
     """
     恐慌抄底雷達（需達成 2+ 項）
     """
-    if df is None or len(df) < 25:
+    if tail and ctx is None:
+        df = _tail(df, panic_lookback(tol))
+    if df is None or len(df) < PANIC_MIN_BARS:
         return None
-    c, h, l = df["Close"], df["High"], df["Low"]
+    ctx = ctx or IndicatorContext(df)
+    c = df["Close"]
     price = c.iloc[-1]
-    ma20_v = MA(c, 20).iloc[-1]
-    r14 = RSI(c, 14).iloc[-1]
-    upper, mid, lower = BB(c, 20, 2)
+    ma20_v = ctx.ma(20).iloc[-1]
+    r14 = ctx.rsi(14).iloc[-1]
+    upper, mid, lower = ctx.bb(20, 2)
     bl = lower.iloc[-1]
     bias = (price - ma20_v) / ma20_v * 100
     vol = df["Volume"]
-    vol_ma20 = vol.rolling(20).mean().iloc[-1]
+    vol_ma20 = ctx.mean("Volume", 20).iloc[-1]
     vol_ratio = vol.iloc[-1] / vol_ma20 if vol_ma20 > 0 else 0
     body = abs(c.iloc[-1] - c.iloc[-2])
     lower_shadow = min(c.iloc[-1], c.iloc[-2]) - min(df["Low"].iloc[-1], df["Low"].iloc[-2])
@@ -217,3 +402,87 @@ def analyze_panic(df):
 
     cnt = sum(d[1] for d in det)
     return {"cnt": cnt, "det": det, "is_panic": cnt >= 2}
+
+
+def analyze(df, df_twii=None, tail=False, tol=TAIL_TOLERANCE):
+    """同一份資料一次跑完右側分析與恐慌雷達（共用指標中間結果），回傳 (analysis, panic)"""
+    if tail:
+        df = _tail(df, max(right_lookback(tol), panic_lookback(tol)))
+    ctx = IndicatorContext(df) if df is not None else None
+    return analyze_right(df, df_twii, ctx=ctx), analyze_panic(df, ctx=ctx)
+
+
+# === 歷史訊號序列（向量化）===
+# 與 analyze_right / analyze_panic 的逐根判斷相同，但一次算出每個日期的結果（O(n)）
+# 只回傳逐根分析會有結果的日期（右側 >= RIGHT_MIN_BARS 根、恐慌 >= PANIC_MIN_BARS 根）
+
+
+def right_signals(df, ctx=None):
+    """
+    右側順勢交易的歷史訊號（DataFrame，index 同 df）
+    欄位：e1~e4（四項進場條件）、score、entry（score >= 3）、trend、macd_signal、
+    exit_cross（跌破 20MA + MACD 死叉）、exit_weak（ADX 轉弱或 +DI < -DI）
+    """
+    if df is None or len(df) < RIGHT_MIN_BARS:
+        return None
+    ctx = ctx or IndicatorContext(df)
+    c = df["Close"]
+    ma20 = ctx.ma(20)
+    ma50 = ctx.ma(50)
+    mc, sc, hc = ctx.macd()
+    adx_val, plus_di, minus_di = ctx.adx_dmi(14)
+    adx, pdi, mdi = adx_val.fillna(0), plus_di.fillna(0), minus_di.fillna(0)
+    vol_ma5 = ctx.mean("Volume", 5)
+    vol_ratio = (df["Volume"] / vol_ma5).where(vol_ma5 > 0, 0)
+
+    golden = (mc.shift(1) < sc.shift(1)) & (mc > sc)
+    death = (mc < sc) & (hc < 0)
+    out = pd.DataFrame(
+        {
+            "e1": c > ma20,
+            "e2": golden,
+            "e3": vol_ratio >= 1.3,
+            "e4": (adx >= 25) & (pdi > mdi),
+        },
+        index=df.index,
+    )
+    out["score"] = out[["e1", "e2", "e3", "e4"]].sum(axis=1)
+    out["entry"] = out["score"] >= 3
+    out["trend"] = np.select(
+        [(ma20 > ma50) & (c > ma20), (ma20 < ma50) & (c < ma20)], ["多頭", "空頭"], "盤整"
+    )
+    out["macd_signal"] = np.select([golden, death], ["▲ 黃金交叉", "▼ 死亡交叉"], "─ 盤整")
+    out["exit_cross"] = (c < ma20) & (mc < sc)
+    out["exit_weak"] = (adx < 20) | (pdi < mdi)
+    return out.iloc[RIGHT_MIN_BARS - 1:]
+
+
+def panic_signals(df, ctx=None):
+    """
+    恐慌抄底雷達的歷史訊號（DataFrame，index 同 df）
+    欄位：c1~c4（BIAS / 布林下軌 / RSI 超賣 / 爆量長下影）、cnt、is_panic
+    """
+    if df is None or len(df) < PANIC_MIN_BARS:
+        return None
+    ctx = ctx or IndicatorContext(df)
+    c = df["Close"]
+    low = df["Low"]
+    ma20 = ctx.ma(20)
+    _, _, lower = ctx.bb(20, 2)
+    vol_ma20 = ctx.mean("Volume", 20)
+    vol_ratio = (df["Volume"] / vol_ma20).where(vol_ma20 > 0, 0)
+    body = (c - c.shift(1)).abs()
+    lower_shadow = np.minimum(c, c.shift(1)) - np.minimum(low, low.shift(1))
+
+    out = pd.DataFrame(
+        {
+            "c1": (c - ma20) / ma20 * 100 <= -5,
+            "c2": c <= lower,
+            "c3": ctx.rsi(14) <= 25,
+            "c4": (vol_ratio >= 2.0) & (lower_shadow > body),
+        },
+        index=df.index,
+    )
+    out["cnt"] = out[["c1", "c2", "c3", "c4"]].sum(axis=1)
+    out["is_panic"] = out["cnt"] >= 2
+    return out.iloc[PANIC_MIN_BARS - 1:]
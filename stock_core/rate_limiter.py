@@ -0,0 +1,115 @@
+"""
+stock_core/rate_limiter.py
+全程序共用的請求排程：每個主機一個 token bucket，互動請求優先於背景工作
+同步（執行緒）與非同步（協程）呼叫端共用同一組 bucket
+"""
+
+import asyncio
+import threading
+import time
+from urllib.parse import urlsplit
+
+INTERACTIVE = 0  # 儀表板等使用者正在等的請求
+BACKGROUND = 1  # 回補、排程等批次工作
+
+# 主機 → (每秒請求數, 最大突發數)
+# TWSE 約每 5 秒超過 3 次請求就可能暫時封鎖 IP
+HOST_LIMITS = {
+    "www.twse.com.tw": (0.6, 3),
+    "www.taifex.com.tw": (1.0, 3),
+    "rate.bot.com.tw": (1.0, 3),
+}
+DEFAULT_LIMIT = (5.0, 10)
+
+
+class TokenBucket:
+    """
+    Token bucket；背景請求不會用掉最後一個 token，
+    且有互動請求在等時會先讓出，使互動請求幾乎不需排隊
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = max(int(burst), 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.interactive_waiting = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, priority=INTERACTIVE):
+        """取得 token 回傳 0，否則回傳建議等待秒數"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            need = 1.0
+            if priority != INTERACTIVE:
+                if self.interactive_waiting:
+                    return 1.0 / self.rate
+                need += 1.0 if self.burst > 1 else 0.0
+            if self.tokens >= need:
+                self.tokens -= 1.0
+                return 0.0
+            return (need - self.tokens) / self.rate
+
+    def _waiting(self, priority, delta):
+        if priority == INTERACTIVE:
+            with self._lock:
+                self.interactive_waiting += delta
+
+    def acquire(self, priority=INTERACTIVE):
+        delay = self.try_acquire(priority)
+        if not delay:
+            return
+        self._waiting(priority, 1)
+        try:
+            while delay:
+                time.sleep(delay)
+                delay = self.try_acquire(priority)
+        finally:
+            self._waiting(priority, -1)
+
+    async def acquire_async(self, priority=INTERACTIVE):
+        delay = self.try_acquire(priority)
+        if not delay:
+            return
+        self._waiting(priority, 1)
+        try:
+            while delay:
+                await asyncio.sleep(delay)
+                delay = self.try_acquire(priority)
+        finally:
+            self._waiting(priority, -1)
+
+
+_buckets = {}
+_lock = threading.Lock()
+
+
+def bucket(host):
+    """取得（必要時建立）主機的 token bucket"""
+    with _lock:
+        if host not in _buckets:
+            _buckets[host] = TokenBucket(*HOST_LIMITS.get(host, DEFAULT_LIMIT))
+        return _buckets[host]
+
+
+def configure(host, rate, burst=None):
+    """調整主機的速率上限（例如回補時放慢）"""
+    with _lock:
+        burst = burst or HOST_LIMITS.get(host, DEFAULT_LIMIT)[1]
+        HOST_LIMITS[host] = (rate, burst)
+        _buckets[host] = TokenBucket(rate, burst)
+
+
+def acquire(url, priority=INTERACTIVE):
+    """同步等待直到可以對 url 的主機發出請求"""
+    bucket(urlsplit(url).hostname).acquire(priority)
+
+
+async def acquire_async(url, priority=INTERACTIVE):
+    """非同步等待直到可以對 url 的主機發出請求"""
+    await bucket(urlsplit(url).hostname).acquire_async(priority)
@@ -0,0 +1,240 @@
+"""
+stock_core/replay.py
+HTTP 錄製／重播：第一次連網把回應存到磁碟，之後離線由本地替身回應
+可設定延遲、抖動與錯誤率，用於離線量測抓取與解析效能、並行與重試行為
+
+啟用方式（擇一）：
+- 環境變數 STOCK_HTTP_MODE=record|replay，STOCK_CASSETTE_DIR 指定目錄
+- 程式內呼叫 replay.install("replay", "/path/to/cassette", latency=0.05)
+
+涵蓋範圍：
+- httpx（TWSE / TAIFEX / BOT，經 http_client）在傳輸層攔截
+- yfinance / FinMind 這類自帶連線的函式庫，在 call() 以函式呼叫為單位錄製結果
+找不到完全相同的請求時（例如日期參數不同），退而使用同一端點最後一次的錄製
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import pickle
+import random
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+
+OFF, RECORD, REPLAY = "off", "record", "replay"
+IGNORED_PARAMS = {"_"}  # TWSE 網址上的 cache-buster，不影響回應內容
+
+
+class MissingRecording(LookupError):
+    """重播模式下找不到對應的錄製內容"""
+
+
+class Cassette:
+    """錄製內容的目錄；每個請求一個檔案，以正規化後的請求內容雜湊為檔名"""
+
+    def __init__(self, directory, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        self.directory = directory
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, ext):
+        return os.path.join(self.directory, f"{key}.{ext}")
+
+    def delay(self):
+        """本次模擬回應的延遲秒數；依 error_rate 決定是否模擬連線失敗"""
+        with self._lock:
+            d = self.latency + self._rng.uniform(-self.jitter, self.jitter)
+            fail = self._rng.random() < self.error_rate
+        return max(d, 0.0), fail
+
+    def load(self, keys, ext):
+        """依序嘗試 keys，回傳第一個存在的錄製內容"""
+        for key in keys:
+            path = self._path(key, ext)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    return f.read()
+        raise MissingRecording(self._path(keys[0], ext))
+
+    def save(self, keys, ext, raw):
+        for key in keys:
+            tmp = self._path(key, ext) + f".{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(raw)
+            os.replace(tmp, self._path(key, ext))
+
+
+def request_key(method, url, body=b""):
+    """正規化請求（排序 query、移除 cache-buster）後取雜湊"""
+    parts = urlsplit(str(url))
+    query = sorted((k, v) for k, v in parse_qsl(parts.query) if k not in IGNORED_PARAMS)
+    norm = urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+    h = hashlib.sha1(f"{method.upper()} {norm}".encode("utf-8"))
+    h.update(body or b"")
+    return h.hexdigest()
+
+
+def loose_key(method, url):
+    """只看主機與路徑的鍵：日期等參數不同時，退而使用同一端點最後一次錄製的回應"""
+    parts = urlsplit(str(url))
+    return "loose-" + hashlib.sha1(
+        f"{method.upper()} {parts.netloc}{parts.path}".encode("utf-8")
+    ).hexdigest()
+
+
+def _dump_response(request, response):
+    return json.dumps(
+        {
+            "method": request.method,
+            "url": str(request.url),
+            "status": response.status_code,
+            "headers": [
+                (k, v) for k, v in response.headers.items()
+                if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")
+            ],
+            "body": base64.b64encode(response.content).decode("ascii"),
+        },
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+
+def _load_response(request, raw):
+    rec = json.loads(raw.decode("utf-8"))
+    return httpx.Response(
+        rec["status"],
+        headers=rec["headers"],
+        content=base64.b64decode(rec["body"]),
+        request=request,
+    )
+
+
+def _keys(request):
+    return [
+        request_key(request.method, request.url, request.content),
+        loose_key(request.method, request.url),
+    ]
+
+
+class ReplayTransport(httpx.BaseTransport):
+    """同步 httpx 傳輸層：錄製模式轉送到真實網路並存檔，重播模式直接讀檔"""
+
+    def __init__(self, cassette, mode, inner=None):
+        self.cassette = cassette
+        self.mode = mode
+        self.inner = inner or httpx.HTTPTransport()
+
+    def handle_request(self, request):
+        keys = _keys(request)
+        if self.mode == RECORD:
+            response = self.inner.handle_request(request)
+            response.read()
+            self.cassette.save(keys, "json", _dump_response(request, response))
+            return response
+        d, fail = self.cassette.delay()
+        time.sleep(d)
+        if fail:
+            raise httpx.ConnectError("replay: simulated failure", request=request)
+        return _load_response(request, self.cassette.load(keys, "json"))
+
+    def close(self):
+        self.inner.close()
+
+
+class AsyncReplayTransport(httpx.AsyncBaseTransport):
+    """非同步版本；模擬延遲使用 asyncio.sleep，並行請求的延遲會重疊"""
+
+    def __init__(self, cassette, mode, inner=None):
+        self.cassette = cassette
+        self.mode = mode
+        self.inner = inner or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request):
+        keys = _keys(request)
+        if self.mode == RECORD:
+            response = await self.inner.handle_async_request(request)
+            await response.aread()
+            self.cassette.save(keys, "json", _dump_response(request, response))
+            return response
+        d, fail = self.cassette.delay()
+        await asyncio.sleep(d)
+        if fail:
+            raise httpx.ConnectError("replay: simulated failure", request=request)
+        return _load_response(request, self.cassette.load(keys, "json"))
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+# === 全程序設定 ===
+
+_mode = os.environ.get("STOCK_HTTP_MODE", OFF)
+_cassette = None
+if _mode != OFF:
+    _cassette = Cassette(
+        os.environ.get("STOCK_CASSETTE_DIR", "cassettes"),
+        latency=float(os.environ.get("STOCK_REPLAY_LATENCY", "0")),
+        jitter=float(os.environ.get("STOCK_REPLAY_JITTER", "0")),
+    )
+
+
+def install(mode, directory, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+    """切換錄製/重播模式；會重建 http_client 的共用連線"""
+    global _mode, _cassette
+    _mode = mode
+    _cassette = (
+        Cassette(directory, latency, jitter, error_rate, seed) if mode != OFF else None
+    )
+    from . import http_client
+
+    http_client.reset()
+
+
+def mode():
+    return _mode
+
+
+def transport(**options):
+    """
+    http_client 建立同步 client 時使用；未啟用時回傳 None（使用預設傳輸層）
+    給了 transport 時 httpx 會忽略 client 的 verify / limits，options 需原樣傳給錄製用的真實傳輸層
+    """
+    if _mode == OFF:
+        return None
+    return ReplayTransport(_cassette, _mode, httpx.HTTPTransport(**options))
+
+
+def async_transport(**options):
+    if _mode == OFF:
+        return None
+    return AsyncReplayTransport(_cassette, _mode, httpx.AsyncHTTPTransport(**options))
+
+
+def call(name, fn, *args, **kwargs):
+    """
+    以函式呼叫為單位錄製/重播（yfinance、FinMind 等不經 http_client 的函式庫）
+    未啟用時直接呼叫 fn；結果以 pickle 存檔
+    """
+    if _mode == OFF:
+        return fn(*args, **kwargs)
+    keys = [
+        hashlib.sha1(repr((name, args, sorted(kwargs.items()))).encode("utf-8")).hexdigest(),
+        "loose-" + hashlib.sha1(name.encode("utf-8")).hexdigest(),
+    ]
+    if _mode == RECORD:
+        result = fn(*args, **kwargs)
+        _cassette.save(keys, "pkl", pickle.dumps(result))
+        return result
+    d, fail = _cassette.delay()
+    time.sleep(d)
+    if fail:
+        raise ConnectionError(f"replay: simulated failure ({name})")
+    return pickle.loads(_cassette.load(keys, "pkl"))
@@ -0,0 +1,150 @@
+"""
+stock_core/result_cache.py
+回測結果的本地持久快取（內容定址）
+鍵 = 雜湊（代碼、日期區間、策略與參數）+ 價格資料版本；價格資料一變，版本不同即視為未命中，
+同一組條件的舊版本結果在寫入新結果時一併刪除。總大小超過上限時依最近使用時間（LRU）淘汰
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+import pandas as pd
+
+from . import store
+
+CACHE_VERSION = 1  # 回測規則或存檔格式改變時遞增，讓舊結果全部失效
+CACHE_MAX_BYTES = int(os.environ.get("STOCK_RESULT_CACHE_MB", "256")) * 1024 * 1024
+CACHE_MAX_ENTRIES = 2000
+
+
+def data_version(df):
+    """價格資料的內容雜湊（含 index）；任何一筆報價變動都會改變版本"""
+    digest = hashlib.sha1(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    digest.update(repr(list(df.columns)).encode())
+    return digest.hexdigest()[:16]
+
+
+def _describe(strategy, name=None):
+    """
+    策略的快取識別：明確給的 name 優先，其次 Strategy 的 repr（含完整參數）
+    一般函式 / lambda / partial 無法由名稱區分參數，回傳 None（不快取）
+    """
+    if name is not None:
+        return f"key:{name}"
+    if strategy is None or hasattr(strategy, "params"):
+        return repr(strategy)
+    return None
+
+
+class ResultCache:
+    """
+    以檔案保存的結果快取，每筆一個 pickle：<資料目錄>/<name>/<條件雜湊>-<資料版本>.pkl
+    讀取命中時更新檔案時間，作為 LRU 依據
+    """
+
+    def __init__(self, name="backtest_cache", max_bytes=CACHE_MAX_BYTES, max_entries=CACHE_MAX_ENTRIES):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+
+    @property
+    def directory(self):
+        # 每次由 store.DATA_DIR 推得，測試或子行程改過資料目錄時跟著走
+        return os.path.join(store.DATA_DIR, self.name)
+
+    def key(self, symbol, start, end, strategy=None, *params, version="", name=None):
+        """
+        (條件雜湊, 資料版本)；params 為其他影響結果的參數（如初始資金）
+        strategy 不是 Strategy 且未給 name 時回傳 None，表示不可快取
+        """
+        described = _describe(strategy, name)
+        if described is None:
+            return None
+        spec = [CACHE_VERSION, symbol, str(start), str(end), described, [repr(p) for p in params]]
+        digest = hashlib.sha256(json.dumps(spec, ensure_ascii=False).encode()).hexdigest()[:32]
+        return digest, version
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key[0]}-{key[1]}.pkl")
+
+    def get(self, key):
+        """命中時回傳存入的物件，否則 None（任何讀取失敗都視為未命中，如舊檔引用已改名的類別）"""
+        if key is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except Exception:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key, value):
+        """原子寫入，刪除同條件的舊資料版本，再依大小上限淘汰"""
+        path = self._path(key)
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        for entry in self._entries():
+            if entry[2].startswith(f"{key[0]}-") and entry[2] != os.path.basename(path):
+                self._remove(entry[2])
+        self.evict()
+
+    def get_or_compute(self, key, compute):
+        """key 為 None（不可快取）時直接計算"""
+        if key is None:
+            return compute()
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def _entries(self):
+        """(最近使用時間, 大小, 檔名)"""
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return entries
+        for name in names:
+            if not name.endswith(".pkl"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+        return entries
+
+    def _remove(self, name):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """超過大小或筆數上限時，從最久未使用的開始刪除"""
+        entries = sorted(self._entries())
+        total = sum(e[1] for e in entries)
+        while entries and (total > self.max_bytes or len(entries) > self.max_entries):
+            _, size, name = entries.pop(0)
+            self._remove(name)
+            total -= size
+
+    def clear(self):
+        for _, _, name in self._entries():
+            self._remove(name)
@@ -0,0 +1,81 @@
+"""
+stock_core/scanner.py
+全市場掃描：以多行程對多檔股票執行 analyze_right / analyze_panic
+資料一律讀本地 OHLCV 儲存（store），掃描過程不連網；只計算所需的尾段（tail mode）
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from . import store
+from .indicators import analyze
+
+COLUMNS = [
+    "symbol", "price", "chg", "trend", "score", "cnt", "is_panic",
+    "adx", "r14", "vol_ratio", "signal",
+]
+
+
+def _scan_one(symbol):
+    """單一股票：讀本地資料並分析，資料不足或失敗時回傳 None"""
+    try:
+        df = store.load_ohlcv(symbol)
+        right, panic = analyze(df, tail=True)
+    except Exception:
+        return None
+    if right is None or panic is None:
+        return None
+    return {
+        "symbol": symbol,
+        "price": float(right["price"]),
+        "chg": float(right["chg"]),
+        "trend": right["trend"],
+        "score": int(right["score"]),
+        "cnt": int(panic["cnt"]),
+        "is_panic": bool(panic["is_panic"]),
+        "adx": float(right["adx"]),
+        "r14": float(right["r14"]),
+        "vol_ratio": float(right["vol_ratio"]),
+        "signal": right["signal"],
+    }
+
+
+def _init_worker(data_dir):
+    # 子行程沿用主行程的資料目錄（主行程可能在匯入後才改過 DATA_DIR）
+    store.DATA_DIR = data_dir
+
+
+def scan(symbols=None, workers=None, chunksize=8):
+    """
+    掃描 symbols（預設為本地儲存中的所有 ticker）
+    回傳 (依 score、cnt、is_panic 排序的 DataFrame, 統計 dict)
+    統計含 symbols、scanned、elapsed、symbols_per_sec、workers
+    symbols_per_sec 只計實際算出結果的檔數（資料不足或讀不到的不算）
+    """
+    symbols = list(symbols) if symbols is not None else store.stored_tickers()
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    if workers == 1:
+        rows = [_scan_one(s) for s in symbols]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(store.DATA_DIR,)
+        ) as ex:
+            rows = list(ex.map(_scan_one, symbols, chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+
+    rows = [r for r in rows if r is not None]
+    df = pd.DataFrame(rows, columns=COLUMNS)
+    df = df.sort_values(["score", "cnt", "is_panic"], ascending=False, kind="stable")
+    df = df.reset_index(drop=True)
+    stats = {
+        "symbols": len(symbols),
+        "scanned": len(rows),
+        "elapsed": elapsed,
+        "symbols_per_sec": len(rows) / elapsed if elapsed > 0 else float("inf"),
+        "workers": workers,
+    }
+    return df, stats
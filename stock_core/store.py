@@ -0,0 +1,203 @@
+"""
+stock_core/store.py
+本地資料儲存（Parquet），避免每次都重新下載完整歷史
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date
+
+import pandas as pd
+
+# === 資料目錄（可由環境變數 STOCK_DATA_DIR 覆寫）===
+DATA_DIR = os.environ.get(
+    "STOCK_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".data"),
+)
+
+
+def data_path(*parts):
+    """回傳資料目錄下的路徑，並確保上層目錄存在"""
+    path = os.path.join(DATA_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def read_frame(path):
+    """讀取 Parquet，不存在或損毀時回傳 None"""
+    if not os.path.exists(path):
+        return None
+    try:
+        return pd.read_parquet(path)
+    except Exception:
+        return None
+
+
+def write_frame(df, path, **kwargs):
+    """原子寫入 Parquet（先寫暫存檔再 rename），避免並行讀到半個檔案"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+    try:
+        df.to_parquet(tmp, **kwargs)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def write_json(obj, path):
+    """原子寫入 JSON（同 write_frame）"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(obj, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def file_age(path):
+    """距離檔案上次寫入的秒數，不存在時回傳 None"""
+    if not os.path.exists(path):
+        return None
+    return time.time() - os.path.getmtime(path)
+
+
+# === OHLCV 歷史報價（每個 ticker 一個檔案）===
+# 檔名會把 ^ / 換成 _，無法由檔名還原；原始 ticker 另記在 _tickers.json（檔名 -> ticker）
+
+_tickers_lock = threading.Lock()
+
+
+def _ohlcv_name(ticker):
+    return ticker.replace("^", "_").replace("/", "_")
+
+
+def _ohlcv_path(ticker):
+    return data_path("ohlcv", f"{_ohlcv_name(ticker)}.parquet")
+
+
+def _ticker_names():
+    try:
+        with open(os.path.join(DATA_DIR, "ohlcv", "_tickers.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def stored_tickers():
+    """本地已有 OHLCV 的所有 ticker（_tickers.json 沒記到的舊檔依檔名推回）"""
+    root = os.path.join(DATA_DIR, "ohlcv")
+    if not os.path.isdir(root):
+        return []
+    names = _ticker_names()
+    tickers = []
+    for f in os.listdir(root):
+        if not f.endswith(".parquet"):
+            continue
+        stem = f[: -len(".parquet")]
+        legacy = stem.replace("_", "^", 1) if stem.startswith("_") else stem
+        tickers.append(names.get(stem, legacy))
+    return sorted(tickers)
+
+
+def load_ohlcv(ticker):
+    return read_frame(_ohlcv_path(ticker))
+
+
+def save_ohlcv(ticker, df):
+    write_frame(df, _ohlcv_path(ticker))
+    name = _ohlcv_name(ticker)
+    with _tickers_lock:
+        names = _ticker_names()
+        if names.get(name) != ticker:
+            names[name] = ticker
+            write_json(names, data_path("ohlcv", "_tickers.json"))
+
+
+def ohlcv_age(ticker):
+    """距離上次寫入的秒數，沒有資料時回傳 None"""
+    return file_age(_ohlcv_path(ticker))
+
+
+def merge_ohlcv(old, new):
+    """合併新舊資料，重疊日期以新資料為準"""
+    if old is None or old.empty:
+        return new.sort_index()
+    if new is None or new.empty:
+        return old
+    df = pd.concat([old, new])
+    df = df[~df.index.duplicated(keep="last")]
+    return df.sort_index()
+
+
+# === 依日期分區的資料集（FinMind 等日資料）===
+
+
+class DatePartitionedStore:
+    """
+    每個日期一個 Parquet 檔：<DATA_DIR>/partitioned/<name>/date=YYYY-MM-DD.parquet
+    另以 _covered.json 記錄已查詢過的日期（含無資料的假日），只向來源要沒查過的日期
+    """
+
+    def __init__(self, name, date_col="date"):
+        self.name = name
+        self.date_col = date_col
+
+    @property
+    def root(self):
+        # 每次由 DATA_DIR 推得：模組層級建立的 store 也會跟著之後改過的資料目錄走
+        return os.path.join(DATA_DIR, "partitioned", self.name)
+
+    @property
+    def _manifest(self):
+        return os.path.join(self.root, "_covered.json")
+
+    def _path(self, d):
+        return os.path.join(self.root, f"date={d}.parquet")
+
+    def covered(self):
+        try:
+            with open(self._manifest, encoding="utf-8") as f:
+                return set(json.load(f))
+        except (OSError, ValueError):
+            return set()
+
+    def missing(self, start, end):
+        """回傳 [start, end] 內尚未查詢過的日期（字串，遞增）"""
+        have = self.covered()
+        days = pd.date_range(start, end, freq="D").strftime("%Y-%m-%d")
+        return [d for d in days if d not in have]
+
+    def write(self, df, start, end, today=None):
+        """
+        寫入 [start, end] 查回的資料並標記為已查詢
+        今天（含）以後沒有資料的日期不標記，下次會再問一次（資料可能尚未公布）
+        """
+        today = (today or date.today()).strftime("%Y-%m-%d")
+        os.makedirs(self.root, exist_ok=True)
+        have = self.covered()
+        with_rows = set()
+        if df is not None and not df.empty:
+            for d, part in df.groupby(df[self.date_col].astype(str)):
+                write_frame(part.reset_index(drop=True), self._path(d))
+                with_rows.add(d)
+        for d in pd.date_range(start, end, freq="D").strftime("%Y-%m-%d"):
+            if d in with_rows or d < today:
+                have.add(d)
+        write_json(sorted(have), self._manifest)
+
+    def read(self, start, end):
+        """讀取 [start, end] 的所有分區，沒有資料時回傳空 DataFrame"""
+        days = pd.date_range(start, end, freq="D").strftime("%Y-%m-%d")
+        parts = [read_frame(self._path(d)) for d in days]
+        parts = [p for p in parts if p is not None]
+        if not parts:
+            return pd.DataFrame()
+        return pd.concat(parts, ignore_index=True)
@@ -0,0 +1,154 @@
+"""
+stock_core/strategies.py
+回測策略：輸入 OHLCV DataFrame，回傳與之等長的訊號陣列（1 進場、-1 出場、0 無）
+內建策略包裝 indicators 的指標，整段資料一次向量化計算，不逐根判斷
+
+任何 df -> 訊號陣列 的函式都可交給回測引擎；繼承 Strategy 時只需實作 rule(ctx)：
+    class MyStrategy(Strategy):
+        def rule(self, ctx):
+            c = ctx.df["Close"]
+            return c > ctx.ma(60), c < ctx.ma(20)    # (進場, 出場) 布林序列
+"""
+
+import numpy as np
+import pandas as pd
+
+from .indicators import IndicatorContext, panic_signals, right_signals
+
+
+def cross_signals(fast, slow):
+    """
+    交叉訊號（陣列比較）
+    1：fast 由下往上穿越 slow；-1：由上往下穿越；0：無。含 NaN 的比較一律不成立
+    也接受 日期 x 股票 的 2 維陣列（沿時間軸比較）
+    """
+    fast, slow = np.asarray(fast, dtype=float), np.asarray(slow, dtype=float)
+    signal = np.zeros(fast.shape, dtype=np.int64)
+    prev_fast, prev_slow = fast[:-1], slow[:-1]
+    curr_fast, curr_slow = fast[1:], slow[1:]
+    up = (prev_fast <= prev_slow) & (curr_fast > curr_slow)
+    down = (prev_fast >= prev_slow) & (curr_fast < curr_slow)
+    signal[1:] = np.where(up, 1, np.where(down, -1, 0))
+    return signal
+
+
+def combine(entry, exit):
+    """進場 / 出場布林合成訊號陣列；同一根同時成立時以出場為準"""
+    entry = np.asarray(entry, dtype=bool)
+    exit = np.asarray(exit, dtype=bool)
+    return np.where(exit, -1, np.where(entry, 1, 0)).astype(np.int64)
+
+
+def single_ticker(df):
+    """
+    yfinance 單一代碼也可能回傳 (欄位, 代碼) 兩層欄位，取單一欄會是 (n, 1)
+    只有一個代碼時去掉代碼層，其餘原樣回傳
+    """
+    if isinstance(df.columns, pd.MultiIndex) and df.columns.get_level_values(-1).nunique() == 1:
+        return df.droplevel(-1, axis=1)
+    return df
+
+
+def _aligned(frame, index, col):
+    # right_signals / panic_signals 只涵蓋資料足夠的日期，其餘視為不成立
+    if frame is None:
+        return np.zeros(len(index), dtype=bool)
+    return frame[col].reindex(index, fill_value=False).to_numpy(dtype=bool)
+
+
+class Strategy:
+    """
+    策略基底：rule(ctx) 回傳 (進場, 出場) 布林序列，signals(df) 合成訊號陣列
+    params 保存建構參數（repr 與快取鍵使用）
+    """
+
+    def __init__(self, **params):
+        self.params = params
+
+    def rule(self, ctx):
+        raise NotImplementedError
+
+    def signals(self, df, ctx=None):
+        entry, exit = self.rule(ctx or IndicatorContext(single_ticker(df)))
+        return combine(entry, exit)
+
+    def __call__(self, df):
+        return self.signals(df)
+
+    def panel(self, frames):
+        """多檔：{代碼: OHLCV} -> 日期 x 代碼 的訊號 DataFrame（對齊所有日期，缺資料為 0）"""
+        columns = {
+            symbol: pd.Series(self.signals(df), index=df.index)
+            for symbol, df in frames.items()
+        }
+        return pd.DataFrame(columns).fillna(0).astype(np.int64)
+
+    def __repr__(self):
+        args = ", ".join(f"{k}={v!r}" for k, v in self.params.items())
+        return f"{type(self).__name__}({args})"
+
+
+class MACross(Strategy):
+    """均線交叉：短均線上穿長均線進場、下穿出場（與 backtest.generate_signals 相同）"""
+
+    def __init__(self, short_window=5, long_window=20):
+        super().__init__(short_window=short_window, long_window=long_window)
+
+    def rule(self, ctx):
+        signal = cross_signals(ctx.ma(self.params["short_window"]), ctx.ma(self.params["long_window"]))
+        return signal == 1, signal == -1
+
+
+class MACDCross(Strategy):
+    """MACD 黃金交叉進場、死亡交叉出場"""
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        super().__init__(fast=fast, slow=slow, signal=signal)
+
+    def rule(self, ctx):
+        macd_line, signal_line, _ = ctx.macd(self.params["fast"], self.params["slow"], self.params["signal"])
+        signal = cross_signals(macd_line, signal_line)
+        return signal == 1, signal == -1
+
+
+class ADXFilter(Strategy):
+    """
+    趨勢濾網：只保留 ADX >= threshold 且 +DI > -DI 時的進場訊號，出場不受影響
+    包裝任一 Strategy，例如 ADXFilter(MACDCross())
+    """
+
+    def __init__(self, base, threshold=25, period=14):
+        super().__init__(base=base, threshold=threshold, period=period)
+
+    def rule(self, ctx):
+        entry, exit = self.params["base"].rule(ctx)
+        adx, plus_di, minus_di = ctx.adx_dmi(self.params["period"])
+        trending = (adx.fillna(0) >= self.params["threshold"]) & (plus_di.fillna(0) > minus_di.fillna(0))
+        return np.asarray(entry, dtype=bool) & trending.to_numpy(), exit
+
+
+class RightSide(Strategy):
+    """右側順勢：analyze_right 的進場條件達 min_score 項進場，跌破 20MA + MACD 死叉出場"""
+
+    def __init__(self, min_score=3):
+        super().__init__(min_score=min_score)
+
+    def rule(self, ctx):
+        sig = right_signals(ctx.df, ctx=ctx)
+        index = ctx.df.index
+        score = sig["score"].reindex(index, fill_value=0).to_numpy() if sig is not None else np.zeros(len(index))
+        return score >= self.params["min_score"], _aligned(sig, index, "exit_cross")
+
+
+class PanicRebound(Strategy):
+    """恐慌抄底：analyze_panic 達 min_count 項進場，收盤站回 exit_ma 日均線出場"""
+
+    def __init__(self, min_count=2, exit_ma=20):
+        super().__init__(min_count=min_count, exit_ma=exit_ma)
+
+    def rule(self, ctx):
+        sig = panic_signals(ctx.df, ctx=ctx)
+        index = ctx.df.index
+        cnt = sig["cnt"].reindex(index, fill_value=0).to_numpy() if sig is not None else np.zeros(len(index))
+        exit = (ctx.df["Close"] > ctx.ma(self.params["exit_ma"])).to_numpy()
+        return cnt >= self.params["min_count"], exit
@@ -0,0 +1,283 @@
+"""
+stock_core/streaming.py
+逐筆更新的指標狀態（O(1) 時間、固定記憶體）
+數值與 indicators.py 的批次函數一致，可由歷史 DataFrame 暖機後接盤中/即時資料
+
+用法：
+    st = MACDState()
+    st.seed(df)                 # 以歷史資料暖機
+    macd, signal, hist = st.update(bar)   # bar 可為 dict/Series（含 Close 等欄位）或收盤價
+"""
+
+import math
+from collections import deque
+
+NAN = float("nan")
+
+
+def _field(bar, key):
+    """bar 為數字時視為收盤價，否則取 bar[key]"""
+    if isinstance(bar, (int, float)):
+        return float(bar)
+    return float(bar[key])
+
+
+class _Indicator:
+    def update(self, bar):
+        raise NotImplementedError
+
+    def seed(self, df):
+        """以歷史 OHLCV DataFrame 逐筆暖機，回傳最後一筆的值"""
+        value = None
+        for bar in df.to_dict("records"):
+            value = self.update(bar)
+        return value
+
+
+class RollingMean(_Indicator):
+    """固定視窗移動平均（環形緩衝 + 補償求和）；視窗未滿或含 NaN 時為 NaN"""
+
+    def __init__(self, period, key="Close"):
+        self.period = period
+        self.key = key
+        self.buf = deque(maxlen=period)
+        self.total = 0.0
+        self.comp = 0.0
+        self.nans = 0
+        self.value = NAN
+
+    def _add(self, x):
+        y = x - self.comp
+        t = self.total + y
+        self.comp = (t - self.total) - y
+        self.total = t
+
+    def push(self, x):
+        if len(self.buf) == self.period:
+            old = self.buf[0]
+            if math.isnan(old):
+                self.nans -= 1
+            else:
+                self._add(-old)
+        self.buf.append(x)
+        if math.isnan(x):
+            self.nans += 1
+        else:
+            self._add(x)
+        if len(self.buf) < self.period or self.nans:
+            self.value = NAN
+        else:
+            self.value = self.total / self.period
+        return self.value
+
+    def update(self, bar):
+        return self.push(_field(bar, self.key))
+
+
+class RollingStd(_Indicator):
+    """固定視窗樣本標準差（ddof=1，Welford 加入/移除）；視窗未滿或含 NaN 時為 NaN"""
+
+    def __init__(self, period, key="Close"):
+        self.period = period
+        self.key = key
+        self.buf = deque(maxlen=period)
+        self.n = 0  # 視窗內非 NaN 的筆數
+        self.nans = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.value = NAN
+
+    def push(self, x):
+        if len(self.buf) == self.period:
+            old = self.buf[0]
+            if math.isnan(old):
+                self.nans -= 1
+            else:
+                self.n -= 1
+                if self.n:
+                    d = old - self.mean
+                    self.mean -= d / self.n
+                    self.m2 -= d * (old - self.mean)
+                else:
+                    self.mean = self.m2 = 0.0
+        self.buf.append(x)
+        if math.isnan(x):
+            self.nans += 1
+        else:
+            self.n += 1
+            d = x - self.mean
+            self.mean += d / self.n
+            self.m2 += d * (x - self.mean)
+        if len(self.buf) < self.period or self.nans or self.period < 2:
+            self.value = NAN
+        else:
+            self.value = math.sqrt(max(self.m2, 0.0) / (self.n - 1))
+        return self.value
+
+    def update(self, bar):
+        return self.push(_field(bar, self.key))
+
+
+class EMAState(_Indicator):
+    """
+    EMA（span=period, adjust=False），第一筆非 NaN 即為初值
+    NaN 不更新數值，但舊值權重照常衰減（與 pandas ewm(ignore_na=False)、batch.EMA 相同）
+    """
+
+    def __init__(self, period, key="Close"):
+        self.alpha = 2.0 / (period + 1)
+        self.key = key
+        self.started = False
+        self.old_wt = 1.0
+        self.value = NAN
+
+    def push(self, x):
+        if self.started:
+            self.old_wt *= 1.0 - self.alpha
+            if not math.isnan(x):
+                self.value = (self.old_wt * self.value + self.alpha * x) / (self.old_wt + self.alpha)
+                self.old_wt = 1.0
+        elif not math.isnan(x):
+            self.value = x
+            self.started = True
+        return self.value
+
+    def update(self, bar):
+        return self.push(_field(bar, self.key))
+
+
+class MACDState(_Indicator):
+    """回傳 (macd_line, signal_line, histogram)"""
+
+    def __init__(self, fast=12, slow=26, signal=9, key="Close"):
+        self.key = key
+        self.fast = EMAState(fast)
+        self.slow = EMAState(slow)
+        self.signal = EMAState(signal)
+        self.value = (NAN, NAN, NAN)
+
+    def update(self, bar):
+        x = _field(bar, self.key)
+        line = self.fast.push(x) - self.slow.push(x)
+        sig = self.signal.push(line)
+        self.value = (line, sig, line - sig)
+        return self.value
+
+
+class RSIState(_Indicator):
+    """RSI（漲跌幅的簡單移動平均，與 indicators.RSI 相同）"""
+
+    def __init__(self, period=14, key="Close"):
+        self.key = key
+        self.prev = None
+        self.gain = RollingMean(period)
+        self.loss = RollingMean(period)
+        self.value = NAN
+
+    def update(self, bar):
+        x = _field(bar, self.key)
+        d = NAN if self.prev is None else x - self.prev
+        self.prev = x
+        avg_gain = self.gain.push(d if d > 0 else 0.0)
+        avg_loss = self.loss.push(-d if d < 0 else 0.0)
+        if math.isnan(avg_gain) or math.isnan(avg_loss):
+            self.value = NAN
+        elif avg_loss == 0:
+            self.value = NAN if avg_gain == 0 else 100.0
+        else:
+            self.value = 100 - (100 / (1 + avg_gain / avg_loss))
+        return self.value
+
+
+class _TRState:
+    def __init__(self):
+        self.prev_close = None
+
+    def push(self, h, l, c):
+        if self.prev_close is None:
+            tr = h - l
+        else:
+            tr = max(h - l, abs(h - self.prev_close), abs(l - self.prev_close))
+        self.prev_close = c
+        return tr
+
+
+class ATRState(_Indicator):
+    def __init__(self, period=14):
+        self.tr = _TRState()
+        self.mean = RollingMean(period)
+        self.value = NAN
+
+    def update(self, bar):
+        tr = self.tr.push(_field(bar, "High"), _field(bar, "Low"), _field(bar, "Close"))
+        self.value = self.mean.push(tr)
+        return self.value
+
+
+class BBState(_Indicator):
+    """回傳 (upper, mid, lower)"""
+
+    def __init__(self, period=20, std_dev=2, key="Close"):
+        self.key = key
+        self.std_dev = std_dev
+        self.mid = RollingMean(period)
+        self.std = RollingStd(period)
+        self.value = (NAN, NAN, NAN)
+
+    def update(self, bar):
+        x = _field(bar, self.key)
+        m = self.mid.push(x)
+        s = self.std.push(x)
+        self.value = (m + self.std_dev * s, m, m - self.std_dev * s)
+        return self.value
+
+
+class AOState(_Indicator):
+    def __init__(self, fast=5, slow=34):
+        self.fast = RollingMean(fast)
+        self.slow = RollingMean(slow)
+        self.value = NAN
+
+    def update(self, bar):
+        med = (_field(bar, "High") + _field(bar, "Low")) / 2
+        self.value = self.fast.push(med) - self.slow.push(med)
+        return self.value
+
+
+class ADXState(_Indicator):
+    """回傳 (adx, +DI, -DI)"""
+
+    def __init__(self, period=14):
+        self.tr = _TRState()
+        self.prev = None
+        self.atr = RollingMean(period)
+        self.plus = RollingMean(period)
+        self.minus = RollingMean(period)
+        self.adx = RollingMean(period)
+        self.value = (NAN, NAN, NAN)
+
+    def update(self, bar):
+        h, l, c = _field(bar, "High"), _field(bar, "Low"), _field(bar, "Close")
+        tr = self.tr.push(h, l, c)
+        if self.prev is None:
+            plus_dm = minus_dm = 0.0
+        else:
+            up_move, down_move = h - self.prev[0], self.prev[1] - l
+            plus_dm = up_move if (up_move > down_move and up_move > 0) else 0.0
+            minus_dm = down_move if (down_move > up_move and down_move > 0) else 0.0
+        self.prev = (h, l)
+        atr_s = self.atr.push(tr)
+        pdi = _div(self.plus.push(plus_dm), atr_s) * 100
+        mdi = _div(self.minus.push(minus_dm), atr_s) * 100
+        dx = _div(abs(pdi - mdi), pdi + mdi) * 100
+        self.value = (self.adx.push(dx), pdi, mdi)
+        return self.value
+
+
+def _div(a, b):
+    """與 pandas 相同的除法語意：x/0 → ±inf，0/0 → NaN"""
+    if b == 0:
+        if a == 0 or math.isnan(a):
+            return NAN
+        return math.copysign(math.inf, a)
+    return a / b
@@ -0,0 +1,69 @@
+"""
+stock_core/symbols.py
+本地股票代碼表：代碼 → 市場（上市 .TW / 上櫃 .TWO）
+由證交所、櫃買中心 OpenAPI 建立並存在本地，每週更新一次；查不到時才退回依代碼猜測
+"""
+
+import os
+
+import pandas as pd
+
+from . import http_client, store
+
+TWSE_LIST_URL = "https://openapi.twse.com.tw/v1/exchangeReport/STOCK_DAY_ALL"
+TPEX_LIST_URL = "https://www.tpex.org.tw/openapi/v1/tpex_mainboard_daily_close_quotes"
+MASTER_MAX_AGE = 7 * 86400  # 代碼表更新週期（秒）
+SUFFIXES = {"TW": ".TW", "TWO": ".TWO"}
+
+_loaded = (None, None)  # ((路徑, 檔案時間), 代碼表)，避免每次 resolve 都讀檔
+
+
+def _fetch_master():
+    twse = http_client.get(TWSE_LIST_URL, http_client.BACKGROUND).json()
+    tpex = http_client.get(TPEX_LIST_URL, http_client.BACKGROUND).json()
+    rows = [(r["Code"], r["Name"], "TW") for r in twse]
+    rows += [(r["SecuritiesCompanyCode"], r["CompanyName"], "TWO") for r in tpex]
+    df = pd.DataFrame(rows, columns=["code", "name", "market"])
+    return df.drop_duplicates("code").set_index("code").sort_index()
+
+
+def master(refresh=False):
+    """
+    代碼表（index：代碼，欄：name、market）
+    本地檔案超過 MASTER_MAX_AGE 或 refresh=True 時重新下載；下載失敗沿用本地舊表
+    """
+    global _loaded
+    path = store.data_path("symbols.parquet")
+    age = store.file_age(path)
+    if refresh or age is None or age > MASTER_MAX_AGE:
+        try:
+            store.write_frame(_fetch_master(), path)
+        except Exception as e:
+            print(f"symbol master refresh failed: {e}")
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=["name", "market"])
+    stamp = (path, os.path.getmtime(path))
+    if _loaded[0] != stamp:
+        _loaded = (stamp, store.read_frame(path))
+    return _loaded[1]
+
+
+def _guess(code):
+    # 代碼表沒有時的舊規則：4 碼且 6 開頭視為上櫃
+    return f"{code}.TWO" if len(code) == 4 and code.startswith("6") else f"{code}.TW"
+
+
+def resolve(code, table=None):
+    """'2330' → '2330.TW'；已帶 .TW / .TWO 後綴則原樣回傳"""
+    if code.endswith(".TW") or code.endswith(".TWO"):
+        return code
+    table = master() if table is None else table
+    if code in table.index:
+        return code + SUFFIXES[table.at[code, "market"]]
+    return _guess(code)
+
+
+def resolve_many(codes):
+    """批次解析，只讀一次代碼表"""
+    table = master()
+    return [resolve(code, table) for code in codes]
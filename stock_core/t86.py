@@ -0,0 +1,210 @@
+"""
+stock_core/t86.py
+TWSE 三大法人買賣超日報（T86）：解析、歷史回補與本地查詢
+"""
+
+import asyncio
+import os
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+from . import http_client, rate_limiter, store, trading_calendar
+
+T86_URL = "https://www.twse.com.tw/rwd/zh/fund/T86?date={date}&selectType=ALL&response=json"
+KEY_COLUMNS = ["證券代號", "證券名稱"]
+T86_NO_DATA = "沒有符合條件的資料"  # 假日 / 尚未公布時 stat 的訊息
+
+_partitions = store.DatePartitionedStore("t86", date_col="日期")
+
+
+def _by_code_path():
+    return os.path.join(store.DATA_DIR, "t86_by_code.parquet")
+
+
+# 給儀表板使用的欄位別名
+ALIASES = {"外陸資買賣超股數(不含外資自營商)": "外資買賣超股數"}
+
+
+def _typed(df):
+    """證券代號/證券名稱去除空白，其餘股數欄位轉為 int64（逗號移除、無法解析視為 0）"""
+    df = df.copy()
+    for col in KEY_COLUMNS:
+        df[col] = df[col].astype(str).str.strip()
+    for col in df.columns.difference(KEY_COLUMNS):
+        df[col] = (
+            pd.to_numeric(df[col].astype(str).str.replace(",", ""), errors="coerce")
+            .fillna(0)
+            .astype("int64")
+        )
+    return df
+
+
+def parse_t86(payload, day):
+    """
+    把 T86 JSON 轉成型別化 DataFrame（回補儲存用，保留原始欄名）
+    證券代號/證券名稱為字串，其餘股數欄位為 int64，加上 datetime64 的 日期 欄
+    """
+    df = pd.DataFrame(payload.get("data", []), columns=payload.get("fields"))
+    if df.empty:
+        return df
+    df = _typed(df)
+    df.insert(0, "日期", pd.Timestamp(day))
+    return df
+
+
+def t86_table(raw):
+    """
+    原始全字串 T86 DataFrame → 精簡型別化表，所有買賣超分析共用
+    index 為證券代號，證券名稱為 category，股數放得下時用 int32，否則 int64
+    """
+    if raw is None or raw.empty:
+        return pd.DataFrame(columns=["證券名稱"] + list(ALIASES.values())).rename_axis("證券代號")
+    df = _typed(raw).rename(columns=ALIASES).set_index("證券代號")
+    df["證券名稱"] = df["證券名稱"].astype("category")
+    i32 = np.iinfo(np.int32)
+    for col in df.columns.drop("證券名稱"):
+        if df[col].between(i32.min, i32.max).all():
+            df[col] = df[col].astype("int32")
+    return df
+
+
+# === 排行（Top-K）===
+
+
+def top_bottom_k(values, k):
+    """
+    一次 argpartition 同時選出前 k 大與前 k 小，只對選出的 2k 筆排序
+    回傳 (由大到小的索引, 由小到大的索引)
+    """
+    values = np.asarray(values)
+    n = len(values)
+    if n <= 2 * k:
+        order = np.argsort(values, kind="stable")
+        return order[::-1][:k], order[:k]
+    part = np.argpartition(values, [k - 1, n - k])
+    top, bottom = part[n - k:], part[:k]
+    top = top[np.argsort(-values[top], kind="stable")]
+    bottom = bottom[np.argsort(values[bottom], kind="stable")]
+    return top, bottom
+
+
+def rank(df, column, k=50):
+    """
+    依 column 取買超前 k 名與賣超前 k 名（排除 0），回傳 (top, bottom)
+    輸出欄位為 證券代號、證券名稱、column；不另做快取（儀表板由 st.cache_data 快取整個結果）
+    """
+    sub = df.loc[df[column] != 0, ["證券名稱", column]]
+    top, bottom = top_bottom_k(sub[column].to_numpy(), k)
+    return sub.iloc[top].reset_index(), sub.iloc[bottom].reset_index()
+
+
+def rank_history(column, start, end=None, k=50):
+    """
+    回補資料中每個交易日的排行：欄位 日期、side（buy/sell）、名次、證券代號、證券名稱、column
+    column 可用原始欄名或 ALIASES 中的別名
+    """
+    df = load_t86(start, end).rename(columns=ALIASES)
+    if df.empty:
+        return df
+    out = []
+    for day, g in df.groupby("日期", sort=True):
+        g = g[g[column] != 0]
+        top, bottom = top_bottom_k(g[column].to_numpy(), k)
+        for side, idx in (("buy", top), ("sell", bottom)):
+            part = g.iloc[idx][["證券代號", "證券名稱", column]]
+            part.insert(0, "名次", np.arange(1, len(idx) + 1))
+            part.insert(0, "side", side)
+            part.insert(0, "日期", day)
+            out.append(part)
+    return pd.concat(out, ignore_index=True)
+
+
+async def _backfill(days, concurrency, retries, log):
+    sem = asyncio.Semaphore(concurrency)
+    done = failed = 0
+
+    async def _one(day):
+        nonlocal done, failed
+        datestr = day.strftime("%Y%m%d")
+        async with sem:
+            for attempt in range(retries + 1):
+                try:
+                    resp = await http_client.aget(
+                        T86_URL.format(date=datestr), http_client.BACKGROUND
+                    )
+                    payload = resp.json()
+                    stat = str(payload.get("stat", ""))
+                    # 只有 OK 或明確的查無資料才算查過；限流頁、錯誤訊息等重試，仍失敗則下次重跑再問
+                    if stat != "OK" and T86_NO_DATA not in stat:
+                        raise ValueError(f"unexpected stat: {stat!r}")
+                    break
+                except Exception as exc:
+                    if attempt == retries:
+                        failed += 1
+                        log(f"{datestr} failed: {exc}")
+                        return
+                    await asyncio.sleep(2 ** attempt)
+        df = parse_t86(payload, day)
+        key = day.strftime("%Y-%m-%d")
+        # 假日或尚未公布（查無資料）：只標記為已查詢，不寫檔
+        _partitions.write(df if not df.empty else None, key, key)
+        done += 1
+        if done % 20 == 0:
+            log(f"{done}/{len(days)} days")
+
+    await asyncio.gather(*(_one(d) for d in days))
+    return done, failed
+
+
+def backfill(start, end=None, concurrency=3, rate=None, retries=2, log=print):
+    """
+    回補 [start, end] 間所有交易日的 T86 到本地（可中斷後重跑，已存日期不會重抓）
+    以背景優先序排隊，不影響同程序內的互動請求；rate 可覆寫 TWSE 每秒請求數上限
+    回傳 (成功天數, 失敗天數)
+    """
+    if rate:
+        rate_limiter.configure(urlsplit(T86_URL).hostname, rate)
+    end = end or trading_calendar.latest_trading_day()
+    sessions = trading_calendar.sessions_between(start, end)
+    covered = _partitions.covered()
+    days = [d for d in sessions if d.strftime("%Y-%m-%d") not in covered]
+    log(f"T86 backfill: {len(days)} of {len(sessions)} trading days to fetch")
+    result = http_client.run(_backfill(days, concurrency, retries, log))
+    build_code_index()
+    return result
+
+
+def build_code_index():
+    """把所有日期分區合併成依 (證券代號, 日期) 排序的單一檔案，供單一個股快速查詢"""
+    if not os.path.isdir(_partitions.root):
+        return
+    files = sorted(f for f in os.listdir(_partitions.root) if f.endswith(".parquet"))
+    if not files:
+        return
+    df = pd.concat(
+        [pd.read_parquet(os.path.join(_partitions.root, f)) for f in files], ignore_index=True
+    )
+    df = df.sort_values(["證券代號", "日期"]).reset_index(drop=True)
+    # 小 row group：依證券代號篩選時只需讀取少數 row group
+    store.write_frame(df, _by_code_path(), row_group_size=20_000)
+
+
+def load_t86(start=None, end=None, code=None):
+    """
+    從本地讀取 T86
+    指定 code 時讀取依代號排序的索引檔，否則讀取 [start, end] 的日期分區
+    """
+    if code is not None:
+        if not os.path.exists(_by_code_path()):
+            return pd.DataFrame()
+        df = pd.read_parquet(_by_code_path(), filters=[("證券代號", "==", str(code))])
+        if start is not None:
+            df = df[df["日期"] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df["日期"] <= pd.Timestamp(end)]
+        return df.set_index("日期")
+    end = end or trading_calendar.latest_trading_day()
+    start = start or end
+    return _partitions.read(start, end)
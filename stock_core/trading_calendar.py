@@ -0,0 +1,149 @@
+"""
+stock_core/trading_calendar.py
+台股（TWSE）交易日曆：週末、國定假日與收盤時間
+預先建好每日對照表，「最近交易日」「前 N 個交易日」皆為 O(1) 查表
+"""
+
+import os
+from datetime import date, datetime, time, timedelta
+
+# === 休市日（不含週末）===
+# 颱風等臨時休市可用環境變數 TWSE_EXTRA_HOLIDAYS="2026-07-10,2026-07-11" 或 add_holidays() 補上
+TWSE_HOLIDAYS = {
+    # 2023
+    "2023-01-02", "2023-01-18", "2023-01-19", "2023-01-20", "2023-01-23",
+    "2023-01-24", "2023-01-25", "2023-01-26", "2023-01-27", "2023-02-27",
+    "2023-02-28", "2023-04-03", "2023-04-04", "2023-04-05", "2023-05-01",
+    "2023-06-22", "2023-06-23", "2023-09-29", "2023-10-09", "2023-10-10",
+    # 2024
+    "2024-01-01", "2024-02-06", "2024-02-07", "2024-02-08", "2024-02-09",
+    "2024-02-12", "2024-02-13", "2024-02-14", "2024-02-28", "2024-04-04",
+    "2024-04-05", "2024-05-01", "2024-06-10", "2024-07-24", "2024-07-25",
+    "2024-09-17", "2024-10-02", "2024-10-03", "2024-10-10", "2024-10-31",
+    # 2025
+    "2025-01-01", "2025-01-23", "2025-01-24", "2025-01-27", "2025-01-28",
+    "2025-01-29", "2025-01-30", "2025-01-31", "2025-02-28", "2025-04-03",
+    "2025-04-04", "2025-05-01", "2025-05-30", "2025-09-29", "2025-10-06",
+    "2025-10-10", "2025-10-24", "2025-12-25",
+    # 2026
+    "2026-01-01", "2026-02-12", "2026-02-13", "2026-02-16", "2026-02-17",
+    "2026-02-18", "2026-02-19", "2026-02-20", "2026-02-27", "2026-04-03",
+    "2026-04-06", "2026-05-01", "2026-06-19", "2026-09-25", "2026-09-28",
+    "2026-10-09", "2026-10-26", "2026-12-25",
+}
+
+# 內建休市日資料涵蓋的範圍；範圍外只排除週末，國定假日會被當成交易日
+HOLIDAYS_FIRST = date(int(min(TWSE_HOLIDAYS)[:4]), 1, 1)
+HOLIDAYS_LAST = date(int(max(TWSE_HOLIDAYS)[:4]), 12, 31)
+UNCOVERED_PROBES = 10  # 範圍外逐日探測時多給的交易日數（足以跨過春節連假）
+
+CLOSE_TIME = time(13, 30)  # 收盤時間；盤後資料的公布時間由呼叫端以 ready 指定
+
+_FIRST = date(2015, 1, 1)
+_LAST = date(2030, 12, 31)
+
+_sessions = []  # 所有交易日（遞增）；HOLIDAYS_FIRST~HOLIDAYS_LAST 以外只排除週末
+_prev_idx = []  # 每個日曆日 → 當日或之前最近交易日在 _sessions 的索引
+
+
+def _build():
+    extra = os.environ.get("TWSE_EXTRA_HOLIDAYS", "")
+    TWSE_HOLIDAYS.update(d.strip() for d in extra.split(",") if d.strip())
+    _sessions.clear()
+    _prev_idx.clear()
+    d = _FIRST
+    while d <= _LAST:
+        if d.weekday() < 5 and d.isoformat() not in TWSE_HOLIDAYS:
+            _sessions.append(d)
+        _prev_idx.append(len(_sessions) - 1)
+        d += timedelta(days=1)
+
+
+def add_holidays(*days):
+    """加入臨時休市日（date 或 'YYYY-MM-DD'）並重建對照表"""
+    TWSE_HOLIDAYS.update(d if isinstance(d, str) else d.isoformat() for d in days)
+    _build()
+
+
+_warned = set()
+
+
+def is_covered(d=None):
+    """d 是否在內建休市日資料範圍內"""
+    return HOLIDAYS_FIRST <= _as_date(d) <= HOLIDAYS_LAST
+
+
+def _check_covered(d):
+    if not is_covered(d) and d.year not in _warned:
+        _warned.add(d.year)
+        print(
+            f"trading_calendar: {d.year} 年沒有休市日資料（僅涵蓋 {HOLIDAYS_FIRST.year}~{HOLIDAYS_LAST.year}），"
+            "國定假日會被當成交易日；請更新 TWSE_HOLIDAYS 或設定 TWSE_EXTRA_HOLIDAYS"
+        )
+
+
+def _as_date(d):
+    if d is None:
+        return date.today()
+    if isinstance(d, datetime):
+        return d.date()
+    if isinstance(d, str):
+        return datetime.strptime(d.replace("-", ""), "%Y%m%d").date()
+    return d
+
+
+def _index_on_or_before(d):
+    if not _FIRST <= d <= _LAST:
+        raise ValueError(f"{d} 超出交易日曆範圍 {_FIRST}~{_LAST}")
+    return _prev_idx[(d - _FIRST).days]
+
+
+def is_trading_day(d=None):
+    d = _as_date(d)
+    i = _index_on_or_before(d)
+    return i >= 0 and _sessions[i] == d
+
+
+def latest_trading_day(now=None, ready=CLOSE_TIME):
+    """
+    最近一個「資料已公布」的交易日
+    now 當天是交易日且已過 ready 時間則回傳當天，否則回傳前一個交易日
+    """
+    now = now or datetime.now()
+    if not isinstance(now, datetime):
+        now = datetime.combine(now, time(23, 59))
+    d = now.date()
+    _check_covered(d)
+    i = _index_on_or_before(d)
+    if _sessions[i] == d and now.time() < ready:
+        i -= 1
+    return _sessions[i]
+
+
+def previous_sessions(n, end=None):
+    """回傳 end（含）以前的最近 n 個交易日，由舊到新"""
+    i = _index_on_or_before(_as_date(end))
+    return _sessions[max(i - n + 1, 0): i + 1]
+
+
+def probe_sessions(n, end=None):
+    """
+    需要逐日探測來源資料時的候選交易日（由舊到新）
+    休市日資料範圍內等同 previous_sessions(n)；範圍外國定假日無法排除，多給 UNCOVERED_PROBES 天
+    """
+    end = _as_date(end)
+    if not is_covered(end):
+        _check_covered(end)
+        n += UNCOVERED_PROBES
+    return previous_sessions(n, end)
+
+
+def sessions_between(start, end):
+    """回傳 [start, end] 之間的所有交易日"""
+    start, end = _as_date(start), _as_date(end)
+    lo = _index_on_or_before(start - timedelta(days=1)) + 1
+    hi = _index_on_or_before(end)
+    return _sessions[lo: hi + 1]
+
+
+_build()
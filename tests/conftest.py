@@ -0,0 +1,29 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_ohlcv(n, seed=0):
+    """隨機漫步的合成 OHLCV"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    return pd.DataFrame(
+        {
+            "Open": close,
+            "High": close * (1 + rng.random(n) * 0.02),
+            "Low": close * (1 - rng.random(n) * 0.02),
+            "Close": close,
+            "Volume": rng.integers(100_000, 10_000_000, n).astype(float),
+        },
+        index=pd.bdate_range("2015-01-01", periods=n),
+    )
+
+
+@pytest.fixture
+def ohlcv():
+    return make_ohlcv
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+backtest = pytest.importorskip("backtest")
+
+
+def _panel(ohlcv):
+    return pd.DataFrame({f"{i}.TW": ohlcv(200, seed=i)["Close"] for i in range(3)})
+
+
+def test_portfolio_aligns_signals_by_label(ohlcv):
+    closes = _panel(ohlcv)
+    signals = backtest.ma_cross_panel(closes)
+    shuffled = signals.iloc[::-1, ::-1]
+    expected = backtest.backtest_portfolio(closes, signals)
+    result = backtest.backtest_portfolio(closes, shuffled)
+    pd.testing.assert_frame_equal(result[0], expected[0])
+    assert result[2] == expected[2]
+
+
+def test_portfolio_missing_signal_columns_are_flat(ohlcv):
+    closes = _panel(ohlcv)
+    signals = backtest.ma_cross_panel(closes)
+    partial = backtest.backtest_portfolio(closes, signals.drop(columns="2.TW"))
+    zeroed = backtest.backtest_portfolio(closes, signals.assign(**{"2.TW": 0}))
+    pd.testing.assert_frame_equal(partial[0], zeroed[0])
+
+
+def test_portfolio_rejects_mismatched_array(ohlcv):
+    closes = _panel(ohlcv)
+    with pytest.raises(ValueError):
+        backtest.backtest_portfolio(closes, np.zeros((len(closes) - 1, closes.shape[1])))
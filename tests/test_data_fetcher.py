@@ -0,0 +1,53 @@
+import sys
+import types
+
+import pandas as pd
+import pytest
+
+from stock_core import data_fetcher, store, trading_calendar
+
+
+@pytest.fixture
+def fake_yf(monkeypatch, tmp_path):
+    # 假的 yf.Ticker.history：以 2024 年的交易日產生報價，記錄每次下載的區間
+    monkeypatch.setattr(store, "DATA_DIR", str(tmp_path))
+    days = pd.DatetimeIndex(trading_calendar.sessions_between("2024-01-01", "2024-12-31")).tz_localize("Asia/Taipei")
+    full = pd.DataFrame({c: range(len(days)) for c in ("Open", "High", "Low", "Close", "Volume")}, index=days, dtype=float)
+    calls = []
+
+    class Ticker:
+        def __init__(self, ticker):
+            self.ticker = ticker
+
+        def history(self, start, end=None):
+            calls.append((start, end))
+            index = full.index.tz_localize(None)
+            return full[(index >= start) & ((index < end) if end else True)]
+
+    monkeypatch.setitem(sys.modules, "yfinance", types.SimpleNamespace(Ticker=Ticker))
+    return calls
+
+
+def test_range_is_served_from_store_once_covered(fake_yf):
+    first = data_fetcher.load_ohlcv_range("2330.TW", "2024-02-01", "2024-06-01")
+    assert len(fake_yf) == 1
+    again = data_fetcher.load_ohlcv_range("2330.TW", "2024-03-01", "2024-05-01")
+    assert len(fake_yf) == 1
+    index = first.index.tz_localize(None)
+    pd.testing.assert_frame_equal(again, first[(index >= "2024-03-01") & (index < "2024-05-01")], check_index_type=False)
+
+
+def test_range_beyond_store_downloads_and_merges(fake_yf):
+    data_fetcher.load_ohlcv_range("2330.TW", "2024-02-01", "2024-04-01")
+    df = data_fetcher.load_ohlcv_range("2330.TW", "2024-02-01", "2024-08-01")
+    assert len(fake_yf) == 2
+    assert df.index[-1].tz_localize(None) < pd.Timestamp("2024-08-01")
+    assert df.index[-1].tz_localize(None) >= pd.Timestamp("2024-07-25")
+    assert store.load_ohlcv("2330.TW").index[0].tz_localize(None) == pd.Timestamp("2024-02-01")
+
+
+def test_holiday_at_range_end_still_covered(fake_yf):
+    # 2024-02-08 ~ 2024-02-14 春節休市：區間結尾落在假日不需再下載
+    data_fetcher.load_ohlcv_range("2330.TW", "2024-01-02", "2024-02-08")
+    data_fetcher.load_ohlcv_range("2330.TW", "2024-01-02", "2024-02-15")
+    assert len(fake_yf) == 1
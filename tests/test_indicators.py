@@ -0,0 +1,47 @@
+import math
+
+import pytest
+
+from stock_core import indicators
+
+
+def _close(a, b, tol=1e-6):
+    if isinstance(a, float) and math.isnan(a):
+        return isinstance(b, float) and math.isnan(b)
+    if isinstance(a, (int, float)):
+        return abs(a - b) <= tol * max(1.0, abs(a))
+    return a == b
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_right_tail_matches_full(ohlcv, seed):
+    df = ohlcv(1500, seed)
+    full = indicators.analyze_right(df)
+    tail = indicators.analyze_right(df, tail=True)
+    assert tail is not None
+    for key, value in full.items():
+        assert _close(value, tail[key]), key
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("n", [25, 30, 300, 1500])
+def test_panic_tail_matches_full(ohlcv, seed, n):
+    df = ohlcv(n, seed)
+    full = indicators.analyze_panic(df)
+    tail = indicators.analyze_panic(df, tail=True)
+    assert tail is not None
+    assert tail["cnt"] == full["cnt"]
+    assert tail["is_panic"] == full["is_panic"]
+    assert [d[:2] for d in tail["det"]] == [d[:2] for d in full["det"]]
+
+
+def test_tail_window_covers_minimum_rows():
+    assert indicators.right_lookback() >= indicators.RIGHT_MIN_BARS
+    assert indicators.panic_lookback() >= indicators.PANIC_MIN_BARS
+
+
+def test_analyze_tail_matches_full(ohlcv):
+    df = ohlcv(800, 7)
+    (right, panic), (right_t, panic_t) = indicators.analyze(df), indicators.analyze(df, tail=True)
+    assert right_t["score"] == right["score"]
+    assert panic_t["cnt"] == panic["cnt"]
@@ -0,0 +1,23 @@
+import pytest
+
+from stock_core import http_client, replay
+
+
+@pytest.fixture
+def record_mode(tmp_path):
+    replay.install(replay.RECORD, str(tmp_path))
+    yield
+    replay.install(replay.OFF, None)
+
+
+def test_record_transport_keeps_client_settings(record_mode):
+    inner = http_client.client()._transport.inner
+    assert inner._pool._ssl_context is http_client.VERIFY
+    assert inner._pool._max_connections == http_client.LIMITS.max_connections
+    assert inner._pool._max_keepalive_connections == http_client.LIMITS.max_keepalive_connections
+
+
+def test_async_record_transport_keeps_client_settings(record_mode):
+    inner = http_client.async_client()._transport.inner
+    assert inner._pool._ssl_context is http_client.VERIFY
+    assert inner._pool._max_connections == http_client.LIMITS.max_connections
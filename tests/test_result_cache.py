@@ -0,0 +1,44 @@
+import functools
+import pickle
+
+import pytest
+
+from stock_core import result_cache, store
+from stock_core.strategies import MACross
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, "DATA_DIR", str(tmp_path))
+    return result_cache.ResultCache("cache_test")
+
+
+def _rule(df, window):
+    return df
+
+
+def test_plain_callables_are_not_cached(cache):
+    for strategy in (lambda df: df, lambda df: df, functools.partial(_rule, window=5)):
+        assert cache.key("2330", "2020-01-01", "2021-01-01", strategy, version="v") is None
+    calls = []
+    for _ in range(2):
+        cache.get_or_compute(None, lambda: calls.append(1))
+    assert len(calls) == 2
+
+
+def test_explicit_name_and_strategy_params_are_keys(cache):
+    a = cache.key("2330", 1, 2, lambda df: df, version="v", name="mine(window=5)")
+    b = cache.key("2330", 1, 2, lambda df: df, version="v", name="mine(window=6)")
+    assert a is not None and a != b
+    assert cache.key("2330", 1, 2, MACross(5, 20), version="v") != cache.key("2330", 1, 2, MACross(5, 30), version="v")
+
+
+def test_unloadable_entry_is_a_miss(cache, monkeypatch):
+    key = cache.key("2330", 1, 2, MACross(), version="v")
+    cache.put(key, {"stats": 1})
+
+    def broken(*args, **kwargs):
+        raise ModuleNotFoundError("renamed")
+
+    monkeypatch.setattr(pickle, "load", broken)
+    assert cache.get(key) is None
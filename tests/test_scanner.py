@@ -0,0 +1,40 @@
+import sys
+import types
+
+import pandas as pd
+
+from stock_core import data_fetcher, scanner, store
+
+
+def _download(frames):
+    # 假的 yf.download（group_by="ticker"，索引不帶時區）
+    def download(tickers, **kwargs):
+        parts = {t: frames[t].tz_localize(None) for t in tickers if t in frames}
+        if not parts:
+            return pd.DataFrame()
+        return pd.concat(parts, axis=1)
+
+    return types.SimpleNamespace(download=download)
+
+
+def test_backfill_then_scan(tmp_path, monkeypatch, ohlcv):
+    monkeypatch.setattr(store, "DATA_DIR", str(tmp_path))
+    frames = {
+        f"{code}.TW": ohlcv(120, seed=i).tz_localize("Asia/Taipei") for i, code in enumerate(["1101", "2330", "2317"])
+    }
+    monkeypatch.setitem(sys.modules, "yfinance", _download(frames))
+    tickers = list(frames) + ["9999.TW"]
+
+    saved, failed = data_fetcher.backfill_ohlcv(tickers, batch_size=2, log=lambda *_: None)
+    assert sorted(saved) == sorted(frames)
+    assert failed == ["9999.TW"]
+    assert store.stored_tickers() == sorted(frames)
+    pd.testing.assert_frame_equal(store.load_ohlcv("2330.TW"), frames["2330.TW"], check_freq=False)
+
+    # 剛更新過的不再下載
+    saved, _ = data_fetcher.backfill_ohlcv(tickers, batch_size=2, log=lambda *_: None)
+    assert saved == []
+
+    df, stats = scanner.scan(tickers, workers=1)
+    assert stats["symbols"] == 4 and stats["scanned"] == 3 == len(df)
+    assert stats["symbols_per_sec"] == stats["scanned"] / stats["elapsed"]
@@ -0,0 +1,34 @@
+import os
+
+import pandas as pd
+
+from stock_core import store
+
+
+def test_partitioned_store_follows_data_dir(tmp_path, monkeypatch):
+    part = store.DatePartitionedStore("follow")
+    for sub in ("a", "b"):
+        monkeypatch.setattr(store, "DATA_DIR", str(tmp_path / sub))
+        assert part.root == os.path.join(str(tmp_path / sub), "partitioned", "follow")
+    part.write(pd.DataFrame({"date": ["2024-01-02"], "v": [1]}), "2024-01-02", "2024-01-02")
+    assert part.covered() == {"2024-01-02"}
+    monkeypatch.setattr(store, "DATA_DIR", str(tmp_path / "a"))
+    assert part.covered() == set()
+
+
+def test_stored_tickers_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, "DATA_DIR", str(tmp_path))
+    df = pd.DataFrame({"Close": [1.0]}, index=pd.to_datetime(["2024-01-02"]))
+    for ticker in ("^TWII", "BRK/B", "2330.TW"):
+        store.save_ohlcv(ticker, df)
+    assert store.stored_tickers() == ["2330.TW", "BRK/B", "^TWII"]
+    assert store.load_ohlcv("BRK/B") is not None
+
+
+def test_stored_tickers_legacy_files(tmp_path, monkeypatch):
+    # 沒有 _tickers.json 的舊資料目錄依檔名推回
+    monkeypatch.setattr(store, "DATA_DIR", str(tmp_path))
+    df = pd.DataFrame({"Close": [1.0]})
+    store.write_frame(df, store.data_path("ohlcv", "_TWII.parquet"))
+    store.write_frame(df, store.data_path("ohlcv", "TSM.parquet"))
+    assert store.stored_tickers() == ["TSM", "^TWII"]
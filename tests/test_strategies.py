@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_core.strategies import MACDCross, MACross, PanicRebound, RightSide, single_ticker
+
+
+def _yfinance_shaped(df, ticker="2330.TW"):
+    # yf.download 單一代碼時的 (欄位, 代碼) 兩層欄位
+    out = df.copy()
+    out.columns = pd.MultiIndex.from_product([df.columns, [ticker]], names=["Price", "Ticker"])
+    return out
+
+
+def test_single_ticker_drops_ticker_level(ohlcv):
+    df = ohlcv(50)
+    assert list(single_ticker(_yfinance_shaped(df)).columns) == list(df.columns)
+    assert single_ticker(df) is df
+
+
+def test_single_ticker_keeps_multi_ticker_panel(ohlcv):
+    df = ohlcv(50)
+    panel = pd.concat({"2330.TW": df, "2317.TW": df}, axis=1).swaplevel(axis=1)
+    assert single_ticker(panel) is panel
+
+
+@pytest.mark.parametrize("strategy", [MACross(), MACDCross(), RightSide(), PanicRebound()], ids=repr)
+def test_signals_accept_yfinance_columns(ohlcv, strategy):
+    df = ohlcv(300, seed=1)
+    signal = strategy(_yfinance_shaped(df))
+    assert signal.shape == (len(df),)
+    np.testing.assert_array_equal(signal, strategy(df))
+
+
+def test_run_strategy_accepts_yfinance_columns(ohlcv):
+    backtest = pytest.importorskip("backtest")
+    df = ohlcv(300, seed=2)
+    results, trades, metrics = backtest.run_strategy(_yfinance_shaped(df), MACross(5, 20))
+    expected = backtest.run_strategy(df, MACross(5, 20))
+    pd.testing.assert_frame_equal(results, expected[0])
+    assert metrics == expected[2]
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from stock_core import indicators, streaming
+
+
+def _gappy(ohlcv, seed):
+    df = ohlcv(200, seed)
+    df.loc[df.index[[60, 61, 120]], ["Open", "High", "Low", "Close"]] = np.nan
+    return df
+
+
+def _run(state, df):
+    return [state.update(bar) for bar in df.to_dict("records")]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_ema_carries_through_nan(ohlcv, seed):
+    df = _gappy(ohlcv, seed)
+    expected = df["Close"].ewm(span=12, adjust=False).mean().to_numpy()
+    got = np.array(_run(streaming.EMAState(12), df))
+    np.testing.assert_allclose(got, expected, rtol=1e-12, equal_nan=True)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_macd_matches_batch_with_nan(ohlcv, seed):
+    df = _gappy(ohlcv, seed)
+    expected = indicators.MACD(df["Close"])
+    got = np.array(_run(streaming.MACDState(), df))
+    for i, series in enumerate(expected):
+        np.testing.assert_allclose(got[:, i], series.to_numpy(), rtol=1e-9, atol=1e-12, equal_nan=True)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_bb_recovers_after_nan_leaves_window(ohlcv, seed):
+    df = _gappy(ohlcv, seed)
+    expected = indicators.BB(df["Close"])
+    got = np.array(_run(streaming.BBState(), df))
+    for i, series in enumerate(expected):
+        np.testing.assert_allclose(got[:, i], series.to_numpy(), rtol=1e-9, equal_nan=True)
+    assert not np.isnan(got[-1]).any()
@@ -0,0 +1,55 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_core import t86
+
+
+def _frame(seed, n=300):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {"證券名稱": [f"S{i}" for i in range(n)], "外資買賣超股數": rng.integers(-10_000, 10_000, n)},
+        index=pd.Index([str(1000 + i) for i in range(n)], name="證券代號"),
+    )
+
+
+@pytest.mark.parametrize("k", [10, 50, 200])
+def test_rank_matches_full_sort(k):
+    df = _frame(0)
+    df.iloc[::7, 1] = 0
+    top, bottom = t86.rank(df, "外資買賣超股數", k)
+    nonzero = df[df["外資買賣超股數"] != 0]
+    expected = nonzero["外資買賣超股數"].sort_values(ascending=False, kind="stable").head(k)
+    assert top["外資買賣超股數"].tolist() == expected.tolist()
+    expected = nonzero["外資買賣超股數"].sort_values(kind="stable").head(k)
+    assert bottom["外資買賣超股數"].tolist() == expected.tolist()
+    assert 0 not in set(top["外資買賣超股數"]) | set(bottom["外資買賣超股數"])
+    assert list(top.columns) == ["證券代號", "證券名稱", "外資買賣超股數"]
+
+
+def test_backfill_marks_only_confirmed_days_covered(tmp_path, monkeypatch):
+    monkeypatch.setattr(t86.store, "DATA_DIR", str(tmp_path))
+    payloads = {
+        "20240102": {"stat": "OK", "fields": ["證券代號", "證券名稱", "外資買賣超股數"], "data": [["2330", "台積電", "1,000"]]},
+        "20240103": {"stat": "很抱歉，沒有符合條件的資料!"},
+        "20240104": {"stat": "查詢日期大於今日，請重新查詢!"},
+        "20240105": {},
+    }
+
+    class _Resp:
+        def __init__(self, payload):
+            self.payload = payload
+
+        def json(self):
+            return self.payload
+
+    async def aget(url, priority):
+        return _Resp(payloads[url.split("date=")[1][:8]])
+
+    monkeypatch.setattr(t86.http_client, "aget", aget)
+    days = [pd.Timestamp(d) for d in payloads]
+    done, failed = asyncio.run(t86._backfill(days, 2, 0, lambda *_: None))
+    assert (done, failed) == (2, 2)
+    assert t86._partitions.covered() == {"2024-01-02", "2024-01-03"}
@@ -0,0 +1,24 @@
+from datetime import date
+
+from stock_core import trading_calendar as tc
+
+
+def test_holiday_data_range_is_pinned():
+    # 新增一年的休市日時一併更新這裡，提醒範圍外會退回逐日探測
+    assert tc.HOLIDAYS_FIRST == date(2023, 1, 1)
+    assert tc.HOLIDAYS_LAST == date(2026, 12, 31)
+    assert tc.is_covered(date(2026, 12, 31))
+    assert not tc.is_covered(date(2027, 1, 4))
+
+
+def test_known_holidays_are_not_sessions():
+    assert not tc.is_trading_day(date(2026, 2, 16))  # 春節
+    assert tc.previous_sessions(1, date(2026, 2, 20)) == [date(2026, 2, 11)]
+
+
+def test_probe_sessions_widens_outside_covered_range():
+    assert tc.probe_sessions(2, date(2026, 6, 1)) == tc.previous_sessions(2, date(2026, 6, 1))
+    end = date(2027, 2, 10)
+    probes = tc.probe_sessions(2, end)
+    assert len(probes) == 2 + tc.UNCOVERED_PROBES
+    assert probes[-1] == end